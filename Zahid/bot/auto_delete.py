@@ -0,0 +1,119 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from pyrogram import Client
+from pyrogram.types import Message
+from pyrogram.errors import (
+    FloodWait, Forbidden, PeerIdInvalid, ChatIdInvalid, UserIsBlocked,
+    InputUserDeactivated, MessageIdInvalid, MessageNotModified,
+)
+from plugins.database import (
+    ensure_auto_delete_index, add_auto_delete, get_due_auto_deletes,
+    get_next_auto_delete, postpone_auto_delete, remove_auto_delete,
+)
+
+# Most message IDs Telegram deletes in a single delete_messages call.
+DELETE_LIMIT = 100
+# Due entries handled per wake up.
+ENTRIES_PER_PASS = 500
+# Seconds before a pass that failed, e.g. while Mongo is unreachable, is retried.
+RETRY_DELAY = 30
+# Seconds past its due time after which Mongo drops an entry no running bot picked up,
+# e.g. the entries of a deleted clone bot.
+STALE_AFTER = 24 * 60 * 60
+# Errors retrying can't fix: the chat is gone or unreachable for the bot, or the notice
+# was deleted or already edited. Any other error postpones the entry by RETRY_DELAY.
+PERMANENT_ERRORS = (
+    Forbidden, PeerIdInvalid, ChatIdInvalid, UserIsBlocked,
+    InputUserDeactivated, MessageIdInvalid, MessageNotModified,
+)
+
+
+def utc(value: datetime) -> datetime:
+    # Motor returns naive datetimes in UTC.
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class AutoDeleteQueue:
+    def __init__(self):
+        """Deletes delivered files once AUTO_DELETE_TIME is up, from a queue kept in Mongo.
+        attributes:
+            clients: the running bots by bot ID, the main bot and every started clone.
+            wakeup: set when an entry or a bot is added, so run() looks for a nearer deadline.
+
+        Handlers only queue their messages and return. One task sleeps until the next
+        due entry and deletes its messages in bulk, entries left by a restart are
+        picked up as soon as their bot is registered again.
+        """
+        self.clients: Dict[int, Client] = {}
+        self.wakeup = asyncio.Event()
+        self.indexed = False
+
+    def register(self, client: Client) -> None:
+        self.clients[client.me.id] = client
+        self.wakeup.set()
+
+    async def schedule(
+        self,
+        client: Client,
+        chat_id: int,
+        message_ids: List[int],
+        delay: float,
+        notice: Optional[Message] = None,
+        notice_text: Optional[str] = None,
+    ) -> None:
+        """Queues message_ids of chat_id for deletion in delay seconds, notice is edited to notice_text afterwards."""
+        await add_auto_delete({
+            'bot_id': client.me.id,
+            'chat_id': chat_id,
+            'message_ids': message_ids,
+            'due': datetime.now(timezone.utc) + timedelta(seconds=delay),
+            'notice_id': notice.id if notice else None,
+            'notice_text': notice_text,
+        })
+        self.wakeup.set()
+
+    async def delete(self, entry: dict) -> None:
+        client = self.clients[entry['bot_id']]
+        message_ids = entry['message_ids']
+        try:
+            for i in range(0, len(message_ids), DELETE_LIMIT):
+                await client.delete_messages(entry['chat_id'], message_ids[i:i + DELETE_LIMIT])
+            if entry.get('notice_id') and entry.get('notice_text'):
+                await client.edit_message_text(entry['chat_id'], entry['notice_id'], entry['notice_text'])
+        except FloodWait as e:
+            logging.warning(f"FloodWait of {e.value}s while auto deleting in {entry['chat_id']}")
+            await postpone_auto_delete(entry['_id'], datetime.now(timezone.utc) + timedelta(seconds=e.value))
+            return
+        except PERMANENT_ERRORS:
+            logging.debug(f"Auto delete in {entry['chat_id']} is no longer possible", exc_info=True)
+        except Exception:
+            # Timeouts, connection errors and Telegram 5xx, deleting again is harmless.
+            logging.warning(f"Auto delete in {entry['chat_id']} failed, retrying in {RETRY_DELAY}s", exc_info=True)
+            await postpone_auto_delete(entry['_id'], datetime.now(timezone.utc) + timedelta(seconds=RETRY_DELAY))
+            return
+        await remove_auto_delete(entry['_id'])
+
+    async def run(self) -> None:
+        while True:
+            self.wakeup.clear()
+            try:
+                if not self.indexed:
+                    await ensure_auto_delete_index(STALE_AFTER)
+                    self.indexed = True
+                bot_ids = list(self.clients)
+                for entry in await get_due_auto_deletes(bot_ids, datetime.now(timezone.utc), ENTRIES_PER_PASS):
+                    await self.delete(entry)
+                due = await get_next_auto_delete(bot_ids)
+            except Exception:
+                logging.exception("Auto delete pass failed")
+                due = datetime.now(timezone.utc) + timedelta(seconds=RETRY_DELAY)
+            timeout = None if due is None else max(0.0, (utc(due) - datetime.now(timezone.utc)).total_seconds())
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+auto_delete = AutoDeleteQueue()
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+from collections import deque
+from itertools import groupby
+from urllib.parse import quote_plus
+from typing import AsyncIterator, Awaitable, Callable, Iterator, List, Tuple, TypeVar
+from pyrogram import Client, raw
+from pyrogram.types import Message, InlineKeyboardButton, InlineKeyboardMarkup
+from pyrogram.errors import FloodWait
+from config import BATCH_SEND_RATE, BATCH_SEND_BURST, URL
+from Zahid.utils.rate_limit import RateLimiter
+from Zahid.utils.manifest import decode_runs
+from Zahid.utils.file_properties import get_name, get_hash
+
+# Most message IDs Telegram accepts in a single get_messages call.
+MESSAGES_PER_CALL = 200
+# Most messages Telegram copies in a single ForwardMessages call.
+FORWARD_LIMIT = 100
+# get_messages calls in flight while scanning a range for /batch.
+SCAN_CONCURRENCY = 4
+# Files listed on one message of stream buttons.
+FILES_PER_KEYBOARD = 40
+# Messages sent per second to one chat, shared by every batch delivered to it.
+chat_limiter = RateLimiter(BATCH_SEND_RATE, BATCH_SEND_BURST)
+# FloodWaits a single send waits out before giving up.
+SEND_RETRIES = 3
+
+T = TypeVar("T")
+
+
+def message_id_calls(manifest: bytes) -> Iterator[Tuple[int, List[int]]]:
+    """
+    Expands an encoded manifest into (channel_id, msg_ids) lists of at most
+    MESSAGES_PER_CALL IDs of the same channel, one list at a time.
+    """
+    channel_id, msg_ids = None, []
+    for run_channel_id, start, count in decode_runs(manifest):
+        for msg_id in range(start, start + count):
+            if msg_ids and (run_channel_id != channel_id or len(msg_ids) == MESSAGES_PER_CALL):
+                yield channel_id, msg_ids
+                msg_ids = []
+            channel_id = run_channel_id
+            msg_ids.append(msg_id)
+    if msg_ids:
+        yield channel_id, msg_ids
+
+
+async def fetch_pages(client: Client, manifest: bytes) -> AsyncIterator[List[Message]]:
+    """
+    Yields the messages of an encoded manifest in order, one get_messages call of up to
+    MESSAGES_PER_CALL IDs of the same channel at a time. Deleted messages are skipped.
+    """
+    for channel_id, msg_ids in message_id_calls(manifest):
+        yield [message for message in await client.get_messages(channel_id, msg_ids) if message and not message.empty]
+
+
+async def fetch_messages(client: Client, manifest: bytes) -> AsyncIterator[Message]:
+    """Yields the messages of an encoded manifest one by one, see fetch_pages."""
+    async for messages in fetch_pages(client, manifest):
+        for message in messages:
+            yield message
+
+
+async def scan_range(client: Client, chat_id: int, first_id: int, last_id: int) -> AsyncIterator[List[Message]]:
+    """
+    Yields the messages first_id..last_id of a chat in order, MESSAGES_PER_CALL at a time,
+    with SCAN_CONCURRENCY get_messages calls in flight ahead of the consumer.
+    """
+    starts = iter(range(first_id, last_id + 1, MESSAGES_PER_CALL))
+    pending = deque()
+
+    def schedule_next():
+        start = next(starts, None)
+        if start is not None:
+            ids = list(range(start, min(start + MESSAGES_PER_CALL, last_id + 1)))
+            pending.append(asyncio.ensure_future(client.get_messages(chat_id, ids)))
+
+    for _ in range(SCAN_CONCURRENCY):
+        schedule_next()
+    try:
+        while pending:
+            messages = await pending.popleft()
+            schedule_next()
+            yield messages
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def send_paced(chat_id: int, send: Callable[[], Awaitable[T]]) -> T:
+    """
+    Runs send once chat_limiter lets another message into the chat, a FloodWait
+    pauses the chat for every batch and the send is retried.
+    """
+    for _ in range(SEND_RETRIES):
+        await chat_limiter.acquire(chat_id)
+        try:
+            return await send()
+        except FloodWait as e:
+            logging.warning(f"FloodWait of {e.value}s while delivering to {chat_id}")
+            chat_limiter.pause(chat_id, e.value)
+    await chat_limiter.acquire(chat_id)
+    return await send()
+
+
+async def copy_grouped(client: Client, chat_id: int, messages: List[Message], sent: List[int]) -> None:
+    """
+    Copies messages to a chat with one ForwardMessages call per FORWARD_LIMIT consecutive
+    messages of the same channel. drop_author sends them as copies with their original
+    captions. The IDs of the sent messages are added to sent as every call returns,
+    so they are kept when a later call fails.
+    """
+    to_peer = await client.resolve_peer(chat_id)
+    for channel_id, group in groupby(messages, key=lambda message: message.chat.id):
+        from_peer = await client.resolve_peer(channel_id)
+        msg_ids = [message.id for message in group]
+        for i in range(0, len(msg_ids), FORWARD_LIMIT):
+            ids = msg_ids[i:i + FORWARD_LIMIT]
+            updates = await send_paced(chat_id, lambda: client.invoke(
+                raw.functions.messages.ForwardMessages(
+                    from_peer=from_peer,
+                    id=ids,
+                    random_id=[client.rnd_id() for _ in ids],
+                    to_peer=to_peer,
+                    drop_author=True,
+                )
+            ))
+            sent += [
+                update.message.id for update in updates.updates
+                if isinstance(update, (raw.types.UpdateNewMessage, raw.types.UpdateNewChannelMessage))
+            ]
+
+
+def stream_entry(message: Message) -> Tuple[int, str, str]:
+    """Returns the (message ID, file name, hash) the stream buttons of a file are made of."""
+    return message.id, get_name(message) or "", get_hash(message)
+
+
+def stream_keyboards(entries: List[Tuple[int, str, str]]) -> List[InlineKeyboardMarkup]:
+    """Returns the download and watch buttons of stream_entry tuples, FILES_PER_KEYBOARD files per keyboard."""
+    rows = []
+    for number, (message_id, file_name, file_hash) in enumerate(entries, start=1):
+        name = quote_plus(file_name)
+        stream = f"{URL}watch/{message_id}/{name}?hash={file_hash}"
+        download = f"{URL}{message_id}/{name}?hash={file_hash}"
+        rows.append([
+            InlineKeyboardButton(f"{number}. {file_name[:40]}", url=download),
+            InlineKeyboardButton("• ᴡᴀᴛᴄʜ •", url=stream),
+        ])
+    return [InlineKeyboardMarkup(rows[i:i + FILES_PER_KEYBOARD]) for i in range(0, len(rows), FILES_PER_KEYBOARD)]
@@ -0,0 +1,157 @@
+import time
+import asyncio
+import logging
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+from pyrogram import Client
+from pyrogram.errors import FloodWait, InputUserDeactivated, UserIsBlocked, PeerIdInvalid
+from config import BROADCAST_RATE, BROADCAST_WORKERS
+from Zahid.utils.rate_limit import RateLimiter
+
+# Messages per second and burst each bot may send, shared by every broadcast of the process.
+limiter = RateLimiter(BROADCAST_RATE, BROADCAST_RATE)
+# Attempts per user before a FloodWait or an unexpected error counts as failed.
+SEND_RETRIES = 3
+# Seconds between two progress callbacks.
+PROGRESS_INTERVAL = 5
+
+
+class Broadcast:
+    def __init__(
+        self,
+        clients: List[Client],
+        from_chat_id: int,
+        message_id: int,
+        on_gone: Callable[[int], Awaitable[None]],
+    ):
+        """Copies one message to many users with a pool of workers and per-bot rate limits.
+        attributes:
+            clients: the bots sending the message, the first one is the bot the users started.
+                Helper bots need access to from_chat_id, a user a helper can't reach is
+                retried through the first bot.
+            from_chat_id, message_id: the message that is copied.
+            on_gone: called with the ID of a user who blocked the bot or deleted the account.
+
+        Every bot has a token bucket of BROADCAST_RATE messages per second, a FloodWait
+        pauses the bucket of that bot for all workers, not only the worker that got it.
+        """
+        self.clients = clients
+        self.from_chat_id = from_chat_id
+        self.message_id = message_id
+        self.on_gone = on_gone
+        self.done = 0
+        self.success = 0
+        self.blocked = 0
+        self.deleted = 0
+        self.failed = 0
+
+    async def copy(self, client: Client, user_id: int) -> None:
+        for attempt in range(SEND_RETRIES):
+            await limiter.acquire(client)
+            try:
+                await client.copy_message(user_id, self.from_chat_id, self.message_id)
+                return
+            except FloodWait as e:
+                logging.warning(f"Broadcast FloodWait of {e.value}s, pausing the bot")
+                limiter.pause(client, e.value)
+        raise RuntimeError(f"Gave up on user {user_id} after {SEND_RETRIES} FloodWaits")
+
+    async def gone(self, user_id: int) -> None:
+        try:
+            await self.on_gone(user_id)
+        except Exception:
+            logging.warning(f"Failed to remove user {user_id} after a broadcast", exc_info=True)
+
+    async def send(self, user_id: int) -> str:
+        client = self.clients[user_id % len(self.clients)]
+        try:
+            try:
+                await self.copy(client, user_id)
+            except (UserIsBlocked, PeerIdInvalid):
+                if client is self.clients[0]:
+                    raise
+                # The user never started this helper bot.
+                await self.copy(self.clients[0], user_id)
+            return "Success"
+        except InputUserDeactivated:
+            await self.gone(user_id)
+            return "Deleted"
+        except UserIsBlocked:
+            await self.gone(user_id)
+            return "Blocked"
+        except PeerIdInvalid:
+            await self.gone(user_id)
+            return "Error"
+        except Exception:
+            logging.debug(f"Broadcast to {user_id} failed", exc_info=True)
+            return "Error"
+
+    async def worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            user_id = await queue.get()
+            if user_id is None:
+                return
+            try:
+                status = await self.send(user_id)
+            except Exception:
+                logging.exception(f"Broadcast worker failed on user {user_id}")
+                status = "Error"
+            if status == "Success":
+                self.success += 1
+            elif status == "Blocked":
+                self.blocked += 1
+            elif status == "Deleted":
+                self.deleted += 1
+            else:
+                self.failed += 1
+            self.done += 1
+
+    @staticmethod
+    async def put(queue: asyncio.Queue, item: Optional[int], workers: List[asyncio.Task]) -> None:
+        """Puts an item on a full queue only while a worker is left to take it."""
+        if not queue.full():
+            queue.put_nowait(item)
+            return
+        put = asyncio.ensure_future(queue.put(item))
+        alive = [task for task in workers if not task.done()]
+        while alive:
+            done, _ = await asyncio.wait([put, *alive], return_when=asyncio.FIRST_COMPLETED)
+            if put in done:
+                return
+            for task in done:
+                alive.remove(task)
+                if not task.cancelled() and task.exception():
+                    put.cancel()
+                    raise task.exception()
+        if put.done():
+            return
+        put.cancel()
+        raise RuntimeError("Every broadcast worker exited before the broadcast ended")
+
+    async def run(
+        self,
+        user_ids: AsyncIterator[Optional[int]],
+        progress: Optional[Callable[["Broadcast"], Awaitable[None]]] = None,
+    ) -> None:
+        """
+        Sends to every user ID, a None ID counts as failed.
+        progress is called every PROGRESS_INTERVAL seconds while the broadcast runs.
+        """
+        queue = asyncio.Queue(maxsize=BROADCAST_WORKERS * 2)
+        workers = [asyncio.create_task(self.worker(queue)) for _ in range(BROADCAST_WORKERS)]
+        last_progress = time.monotonic()
+        try:
+            async for user_id in user_ids:
+                if user_id is None:
+                    self.failed += 1
+                    self.done += 1
+                    continue
+                await self.put(queue, user_id, workers)
+                if progress and time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+                    last_progress = time.monotonic()
+                    await progress(self)
+            for _ in workers:
+                await self.put(queue, None, workers)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
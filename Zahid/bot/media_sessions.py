@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import random
+from typing import Dict, Iterable, List, Tuple
+from pyrogram import Client, raw
+from pyrogram.session import Session, Auth
+from pyrogram.errors import AuthBytesInvalid
+from config import MEDIA_SESSIONS_PER_DC, MEDIA_SESSION_PING_INTERVAL
+from Zahid.utils.singleflight import SingleFlight
+from . import multi_clients
+
+
+class MediaSessionManager:
+    def __init__(self, per_dc: int, ping_interval: int):
+        """Keeps a pool of media sessions per (client, DC).
+        attributes:
+            per_dc: the number of sessions kept per client and DC, GetFile calls are spread over them.
+            ping_interval: the seconds between health checks of every session.
+            pools: the live sessions by (client, dc_id).
+
+        functions:
+            get: returns a session for a client and DC, creating the first one on demand.
+            warm: creates the sessions of every client for the given DCs ahead of the first request.
+            monitor: pings every session periodically and replaces the ones that stopped answering.
+        """
+        self.per_dc = max(1, per_dc)
+        self.ping_interval = ping_interval
+        self.pools: Dict[Tuple[Client, int], List[Session]] = {}
+        self.turns: Dict[Tuple[Client, int], int] = {}
+        self.flights = SingleFlight("media session")
+        self.replaced = 0
+
+    async def create(self, client: Client, dc_id: int) -> Session:
+        """
+        Creates a media session for the DC, exporting the authorization of the
+        client when the DC is not its home DC.
+        """
+        if dc_id != await client.storage.dc_id():
+            media_session = Session(
+                client,
+                dc_id,
+                await Auth(
+                    client, dc_id, await client.storage.test_mode()
+                ).create(),
+                await client.storage.test_mode(),
+                is_media=True,
+            )
+            await media_session.start()
+
+            for _ in range(6):
+                exported_auth = await client.invoke(
+                    raw.functions.auth.ExportAuthorization(dc_id=dc_id)
+                )
+
+                try:
+                    await media_session.send(
+                        raw.functions.auth.ImportAuthorization(
+                            id=exported_auth.id, bytes=exported_auth.bytes
+                        )
+                    )
+                    break
+                except AuthBytesInvalid:
+                    logging.debug(
+                        f"Invalid authorization bytes for DC {dc_id}"
+                    )
+                    continue
+            else:
+                await media_session.stop()
+                raise AuthBytesInvalid
+        else:
+            media_session = Session(
+                client,
+                dc_id,
+                await client.storage.auth_key(),
+                await client.storage.test_mode(),
+                is_media=True,
+            )
+            await media_session.start()
+        logging.debug(f"Created media session for DC {dc_id}")
+        return media_session
+
+    async def add(self, client: Client, dc_id: int) -> Session:
+        key = (client, dc_id)
+        media_session = await self.create(client, dc_id)
+        pool = self.pools.setdefault(key, [])
+        pool.append(media_session)
+        # Keep Pyrogram's own downloads on the same session.
+        client.media_sessions[dc_id] = pool[0]
+        return media_session
+
+    async def grow(self, client: Client, dc_id: int) -> None:
+        key = (client, dc_id)
+        if len(self.pools.get(key, [])) >= self.per_dc:
+            return
+        await self.flights.do(key, lambda: self.add(client, dc_id))
+
+    def is_warm(self, client: Client, dc_id: int) -> bool:
+        return bool(self.pools.get((client, dc_id)))
+
+    async def get(self, client: Client, dc_id: int) -> Session:
+        """
+        Returns the next session of the pool in round-robin order.
+        The first session of a pool is created inline, the rest in the background.
+        """
+        key = (client, dc_id)
+        if not self.pools.get(key):
+            await self.grow(client, dc_id)
+        else:
+            logging.debug(f"Using cached media session for DC {dc_id}")
+        pool = self.pools[key]
+        if len(pool) < self.per_dc and key not in self.flights.calls:
+            asyncio.create_task(self.grow(client, dc_id))
+        turn = self.turns.get(key, 0)
+        self.turns[key] = turn + 1
+        return pool[turn % len(pool)]
+
+    async def warm(self, dc_ids: Iterable[int]) -> None:
+        dc_ids = sorted(set(dc_ids))
+        for client in list(multi_clients.values()):
+            for dc_id in dc_ids:
+                for _ in range(self.per_dc):
+                    try:
+                        await self.grow(client, dc_id)
+                    except Exception:
+                        logging.warning(f"Failed to pre-warm a media session for DC {dc_id}", exc_info=True)
+                        break
+        logging.info(f"Pre-warmed media sessions for DCs {dc_ids} on {len(multi_clients)} clients")
+
+    async def ping(self, media_session: Session) -> bool:
+        try:
+            await asyncio.wait_for(
+                media_session.send(raw.functions.Ping(ping_id=random.getrandbits(63))),
+                timeout=15,
+            )
+            return True
+        except Exception:
+            return False
+
+    async def replace(self, client: Client, dc_id: int, media_session: Session) -> None:
+        pool = self.pools.get((client, dc_id), [])
+        if media_session in pool:
+            pool.remove(media_session)
+        if client.media_sessions.get(dc_id) is media_session:
+            client.media_sessions.pop(dc_id)
+            if pool:
+                client.media_sessions[dc_id] = pool[0]
+        try:
+            await media_session.stop()
+        except Exception:
+            pass
+        self.replaced += 1
+        logging.warning(f"Replacing a broken media session for DC {dc_id}")
+        await self.grow(client, dc_id)
+
+    async def monitor(self) -> None:
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            for (client, dc_id), pool in list(self.pools.items()):
+                for media_session in list(pool):
+                    if not await self.ping(media_session):
+                        try:
+                            await self.replace(client, dc_id, media_session)
+                        except Exception:
+                            logging.warning(f"Failed to reconnect a media session for DC {dc_id}", exc_info=True)
+
+    async def start(self, dc_ids: Iterable[int]) -> None:
+        await self.warm(dc_ids)
+        await self.monitor()
+
+    def stats(self) -> dict:
+        pools = {}
+        for (client, dc_id), pool in self.pools.items():
+            name = next((f"bot{i + 1}" for i, c in multi_clients.items() if c is client), "unknown")
+            pools.setdefault(name, {})[f"dc{dc_id}"] = len(pool)
+        return {"pools": pools, "replaced": self.replaced}
+
+
+media_sessions = MediaSessionManager(MEDIA_SESSIONS_PER_DC, MEDIA_SESSION_PING_INTERVAL)
@@ -0,0 +1,119 @@
+import time
+import logging
+from collections import deque
+from typing import Dict, Iterable, List
+from . import multi_clients, work_loads
+from .media_sessions import media_sessions
+
+# Assumed bytes/sec of a client that has not streamed anything yet.
+DEFAULT_THROUGHPUT = 2 * 1024 * 1024
+# Weight of the newest sample in the throughput EWMA.
+THROUGHPUT_ALPHA = 0.2
+# Seconds it roughly takes to set up a media session on a cold DC.
+SESSION_SETUP_TIME = 1.5
+# Seconds a client is avoided after a timeout or connection error.
+ERROR_COOLDOWN = 10
+
+
+class ClientStats:
+    def __init__(self):
+        self.throughput: float = 0
+        self.parts = 0
+        self.errors = 0
+        self.flood_waits = 0
+        self.cooldown_until: float = 0
+
+
+class StreamScheduler:
+    def __init__(self):
+        """Routes streams to the client with the best expected completion time.
+        attributes:
+            clients: the ClientStats of every client index.
+            decisions: the most recent routing decisions, shown on the status route.
+
+        The estimate for a client is the time to send the requested bytes at its
+        EWMA throughput, shared with the streams it is already serving, plus the
+        setup of a media session if it has none for the DC, plus what is left of
+        a FloodWait or error cooldown.
+        """
+        self.clients: Dict[int, ClientStats] = {}
+        self.decisions = deque(maxlen=20)
+
+    def get(self, index: int) -> ClientStats:
+        if index not in self.clients:
+            self.clients[index] = ClientStats()
+        return self.clients[index]
+
+    def throughput(self, index: int) -> float:
+        return self.get(index).throughput
+
+    def record_part(self, index: int, size: int, elapsed: float) -> None:
+        stats = self.get(index)
+        stats.parts += 1
+        if size < 64 * 1024 or elapsed <= 0:
+            # Small parts are dominated by latency and say little about bandwidth.
+            return
+        speed = size / elapsed
+        stats.throughput = speed if not stats.throughput else (
+            THROUGHPUT_ALPHA * speed + (1 - THROUGHPUT_ALPHA) * stats.throughput
+        )
+
+    def record_error(self, index: int, cooldown: float = ERROR_COOLDOWN) -> None:
+        stats = self.get(index)
+        stats.errors += 1
+        stats.cooldown_until = max(stats.cooldown_until, time.monotonic() + cooldown)
+
+    def record_flood_wait(self, index: int, seconds: float) -> None:
+        stats = self.get(index)
+        stats.flood_waits += 1
+        stats.cooldown_until = max(stats.cooldown_until, time.monotonic() + seconds)
+        logging.warning(f"Client {index} hit a FloodWait of {seconds}s")
+
+    def cooldown(self, index: int) -> float:
+        return max(0, self.get(index).cooldown_until - time.monotonic())
+
+    def expected_time(self, index: int, dc_id: int, size: int) -> float:
+        stats = self.get(index)
+        throughput = stats.throughput or DEFAULT_THROUGHPUT
+        estimate = size * (work_loads.get(index, 0) + 1) / throughput
+        if not media_sessions.is_warm(multi_clients[index], dc_id):
+            estimate += SESSION_SETUP_TIME
+        return estimate + self.cooldown(index)
+
+    def rank(self, dc_id: int, size: int, exclude: Iterable[int] = ()) -> List[int]:
+        exclude = set(exclude)
+        candidates = [i for i in multi_clients if i not in exclude]
+        return sorted(candidates, key=lambda i: (self.expected_time(i, dc_id, size), work_loads.get(i, 0)))
+
+    def pick(self, dc_id: int, size: int, exclude: Iterable[int] = ()) -> int:
+        ranking = self.rank(dc_id, size, exclude)
+        if not ranking:
+            raise LookupError("No client available to serve the stream")
+        index = ranking[0]
+        self.decisions.append({
+            "bot": f"bot{index + 1}",
+            "dc": dc_id,
+            "bytes": size,
+            "expected_seconds": round(self.expected_time(index, dc_id, size), 3),
+            "at": int(time.time()),
+        })
+        return index
+
+    def stats(self) -> dict:
+        return {
+            "clients": {
+                f"bot{index + 1}": {
+                    "throughput_kib_s": round(self.get(index).throughput / 1024, 1),
+                    "load": work_loads.get(index, 0),
+                    "parts": self.get(index).parts,
+                    "errors": self.get(index).errors,
+                    "flood_waits": self.get(index).flood_waits,
+                    "cooldown": round(self.cooldown(index), 1),
+                }
+                for index in sorted(multi_clients)
+            },
+            "recent_decisions": list(self.decisions),
+        }
+
+
+scheduler = StreamScheduler()
@@ -1,8 +1,7 @@
-from aiohttp import web
-from .stream_routes import routes
-
-
 async def web_server():
+    # Imported here so python -m Zahid.server can time the stream stack from a cold start.
+    from aiohttp import web
+    from .stream_routes import routes
     web_app = web.Application(client_max_size=30000000)
     web_app.add_routes(routes)
     return web_app
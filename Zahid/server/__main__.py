@@ -0,0 +1,54 @@
+"""Stream-only entry point: python -m Zahid.server
+
+Serves / and /watch with BOT_TOKEN and every MULTI_TOKEN bot, without updates and
+without importing the bot plugins, so a restarted dyno serves again quickly.
+The time spent importing each part of the stream stack is reported on startup.
+"""
+import time
+import logging
+import importlib
+
+# Import time of the stream stack a cold start should stay within, in seconds.
+IMPORT_BUDGET = 0.5
+# Imported in order, each entry is charged for the modules it pulls in first.
+STREAM_STACK = (
+    "config",
+    "aiohttp.web",
+    "pyrogram",
+    "motor.motor_asyncio",
+    "umongo",
+    "plugins.database",
+    "Zahid.bot",
+    "Zahid.utils.custom_dl",
+    "Zahid.server.stream_routes",
+    "Zahid.server.worker",
+)
+
+
+def import_stream_stack() -> None:
+    timings = []
+    started = time.perf_counter()
+    for name in STREAM_STACK:
+        module_started = time.perf_counter()
+        importlib.import_module(name)
+        timings.append((name, time.perf_counter() - module_started))
+    total = time.perf_counter() - started
+    for name, elapsed in sorted(timings, key=lambda t: t[1], reverse=True):
+        logging.info(f"import {name:<24} {elapsed * 1000:8.1f} ms")
+    log = logging.warning if total > IMPORT_BUDGET else logging.info
+    log(f"Imported the stream stack in {total * 1000:.0f} ms (budget {IMPORT_BUDGET * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        force=True,
+    )
+    import_stream_stack()
+    logging.getLogger("pyrogram").setLevel(logging.ERROR)
+
+    import asyncio
+    from Zahid.server.worker import serve
+
+    asyncio.get_event_loop().run_until_complete(serve(0, 1))
@@ -1,18 +1,22 @@
 import re
 import time
-import math
 import logging
 import secrets
 import mimetypes
 from aiohttp import web
 from aiohttp.http_exceptions import BadStatusLine
 from Zahid.bot import multi_clients, work_loads, StreamBot
-from Zahid.server.exceptions import FIleNotFound, InvalidHash
+from Zahid.bot.media_sessions import media_sessions
+from Zahid.bot.scheduler import scheduler
+from Zahid.utils.loop_lag import loop_lag
+from Zahid.utils.mongo import pool_stats
+from Zahid.server.exceptions import FIleNotFound, InvalidHash, RangeNotSatisfiable
 from Zahid import StartTime, __version__
 from ..utils.time_format import get_readable_time
-from ..utils.custom_dl import ByteStreamer
+from ..utils.custom_dl import get_byte_streamer, cached_file_ids, MAX_CHUNK_SIZE
 from Zahid.utils.render_template import render_page
-from config import MULTI_CLIENT
+from Zahid.utils.http_range import parse_range, if_range_matches, http_date
+from config import MULTI_CLIENT, STRIPE_CLIENTS, STRIPE_MIN_SIZE
 
 
 routes = web.RouteTableDef()
@@ -31,6 +35,11 @@ async def root_route_handler(_):
                     sorted(work_loads.items(), key=lambda x: x[1], reverse=True)
                 )
             ),
+            "file_id_cache": cached_file_ids.stats(),
+            "media_sessions": media_sessions.stats(),
+            "scheduler": scheduler.stats(),
+            "loop_lag": loop_lag.stats(),
+            "mongo_pool": pool_stats.stats(),
             "version": __version__,
         }
     )
@@ -80,26 +89,26 @@ async def stream_handler(request: web.Request):
         logging.critical(e.with_traceback(None))
         raise web.HTTPInternalServerError(text=str(e))
 
-class_cache = {}
+async def get_stripes(id: int, index: int, dc_id: int, req_length: int) -> list:
+    """Returns (ByteStreamer, FileId, index) of the helper clients the scheduler ranks best for a striped download."""
+    stripes = []
+    for helper in scheduler.rank(dc_id, req_length, exclude=[index]):
+        if len(stripes) >= STRIPE_CLIENTS - 1:
+            break
+        if scheduler.cooldown(helper):
+            continue
+        streamer = get_byte_streamer(helper)
+        try:
+            stripes.append((streamer, await streamer.get_file_properties(id), helper))
+        except Exception:
+            logging.warning(f"Client {helper} can't serve message {id}, skipping it for striping", exc_info=True)
+    return stripes
 
 async def media_streamer(request: web.Request, id: int, secure_hash: str):
-    range_header = request.headers.get("Range", 0)
-    
-    index = min(work_loads, key=work_loads.get)
-    faster_client = multi_clients[index]
-    
-    if MULTI_CLIENT:
-        logging.info(f"Client {index} is now serving {request.remote}")
-
-    if faster_client in class_cache:
-        tg_connect = class_cache[faster_client]
-        logging.debug(f"Using cached ByteStreamer object for client {index}")
-    else:
-        logging.debug(f"Creating new ByteStreamer object for client {index}")
-        tg_connect = ByteStreamer(faster_client)
-        class_cache[faster_client] = tg_connect
+    # The file ID cache is shared by every client, so the properties are resolved
+    # first and the client is picked once the DC and the range are known.
     logging.debug("before calling get_file_properties")
-    file_id = await tg_connect.get_file_properties(id)
+    file_id = await get_byte_streamer(0).get_file_properties(id)
     logging.debug("after calling get_file_properties")
     
     if file_id.unique_id[:6] != secure_hash:
@@ -107,34 +116,25 @@ async def media_streamer(request: web.Request, id: int, secure_hash: str):
         raise InvalidHash
     
     file_size = file_id.file_size
-
-    if range_header:
-        from_bytes, until_bytes = range_header.replace("bytes=", "").split("-")
-        from_bytes = int(from_bytes)
-        until_bytes = int(until_bytes) if until_bytes else file_size - 1
+    etag = f'"{file_id.unique_id}"'
+    last_modified = getattr(file_id, "date", None)
+
+    byte_range = None
+    if if_range_matches(request.headers.get("If-Range"), etag, last_modified):
+        try:
+            byte_range = parse_range(request.headers.get("Range"), file_size)
+        except RangeNotSatisfiable as e:
+            return web.Response(
+                status=416,
+                body=e.message,
+                headers={"Content-Range": f"bytes */{file_size}"},
+            )
+
+    if byte_range:
+        from_bytes, until_bytes = byte_range
     else:
-        from_bytes = request.http_range.start or 0
-        until_bytes = (request.http_range.stop or file_size) - 1
-
-    if (until_bytes > file_size) or (from_bytes < 0) or (until_bytes < from_bytes):
-        return web.Response(
-            status=416,
-            body="416: Range not satisfiable",
-            headers={"Content-Range": f"bytes */{file_size}"},
-        )
-
-    chunk_size = 1024 * 1024
-    until_bytes = min(until_bytes, file_size - 1)
-
-    offset = from_bytes - (from_bytes % chunk_size)
-    first_part_cut = from_bytes - offset
-    last_part_cut = until_bytes % chunk_size + 1
-
+        from_bytes, until_bytes = 0, file_size - 1
     req_length = until_bytes - from_bytes + 1
-    part_count = math.ceil(until_bytes / chunk_size) - math.floor(offset / chunk_size)
-    body = tg_connect.yield_file(
-        file_id, index, offset, first_part_cut, last_part_cut, part_count, chunk_size
-    )
 
     mime_type = file_id.mime_type
     file_name = file_id.file_name
@@ -148,19 +148,69 @@ async def media_streamer(request: web.Request, id: int, secure_hash: str):
                 file_name = f"{secrets.token_hex(2)}.unknown"
     else:
         if file_name:
-            mime_type = mimetypes.guess_type(file_id.file_name)
+            mime_type = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
         else:
             mime_type = "application/octet-stream"
             file_name = f"{secrets.token_hex(2)}.unknown"
 
-    return web.Response(
-        status=206 if range_header else 200,
-        body=body,
-        headers={
-            "Content-Type": f"{mime_type}",
-            "Content-Range": f"bytes {from_bytes}-{until_bytes}/{file_size}",
-            "Content-Length": str(req_length),
-            "Content-Disposition": f'{disposition}; filename="{file_name}"',
-            "Accept-Ranges": "bytes",
-        },
+    headers = {
+        "Content-Type": f"{mime_type}",
+        "Content-Length": str(req_length),
+        "Content-Disposition": f'{disposition}; filename="{file_name}"',
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+    }
+    if last_modified:
+        headers["Last-Modified"] = http_date(last_modified)
+    if byte_range:
+        headers["Content-Range"] = f"bytes {from_bytes}-{until_bytes}/{file_size}"
+
+    response = web.StreamResponse(status=206 if byte_range else 200, headers=headers)
+
+    # HEAD and empty bodies are answered from the file properties alone,
+    # without opening a media session or touching Telegram.
+    if request.method == "HEAD" or req_length <= 0:
+        await response.prepare(request)
+        await response.write_eof()
+        return response
+
+    index = scheduler.pick(file_id.dc_id, req_length)
+    if MULTI_CLIENT:
+        logging.info(f"Client {index} is now serving {request.remote}")
+    tg_connect = get_byte_streamer(index)
+
+    chunk_size = tg_connect.choose_chunk_size(req_length)
+
+    stripes = []
+    if STRIPE_CLIENTS > 1 and req_length > MAX_CHUNK_SIZE and file_size >= STRIPE_MIN_SIZE:
+        stripes = await get_stripes(id, index, file_id.dc_id, req_length)
+        if stripes:
+            logging.info(f"Striping message {id} across clients {[index] + [i for _, _, i in stripes]}")
+
+    body = tg_connect.yield_file(
+        file_id, index, from_bytes, until_bytes, chunk_size, stripes
     )
+
+    await response.prepare(request)
+    await write_body(request, response, body)
+    return response
+
+
+async def write_body(request: web.Request, response: web.StreamResponse, body) -> None:
+    """
+    Writes the memoryviews yielded by ByteStreamer straight to the response.
+    Every write waits for the transport to drain, so the read-ahead window is the
+    only buffering between Telegram and a slow client.
+    """
+    try:
+        async for chunk in body:
+            if request.transport is None or request.transport.is_closing():
+                logging.debug(f"{request.remote} disconnected, stopping the stream")
+                break
+            await response.write(chunk)
+        else:
+            await response.write_eof()
+    except ConnectionResetError:
+        logging.debug(f"{request.remote} reset the connection while streaming")
+    finally:
+        await body.aclose()
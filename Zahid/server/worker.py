@@ -0,0 +1,126 @@
+import sys
+import atexit
+import asyncio
+import asyncio.subprocess
+import logging
+from typing import Dict, Set
+from aiohttp import web
+from pyrogram import Client
+from config import API_ID, API_HASH, BOT_TOKEN, BOT_USERNAME, PORT, SLEEP_THRESHOLD
+from Zahid.bot import multi_clients, work_loads, StreamBot
+from Zahid.bot.media_sessions import media_sessions
+from Zahid.utils.config_parser import TokenParser
+from Zahid.utils.chunk_cache import chunk_cache
+from Zahid.utils.loop_lag import loop_lag
+from plugins.database import get_indexed_dc_ids
+from . import web_server
+
+# Seconds before a worker that exited is started again.
+RESTART_DELAY = 5
+# Worker processes started by supervise, terminated when the control process exits.
+worker_processes: Set[asyncio.subprocess.Process] = set()
+
+
+def worker_tokens(worker: int, count: int) -> Dict[int, str]:
+    """
+    Returns the bot tokens of a worker by their fleet index, BOT_TOKEN being 0.
+    Tokens are dealt round-robin, a worker left without one shares a token with another.
+    """
+    tokens = {0: BOT_TOKEN, **TokenParser().parse_from_env()}
+    ids = sorted(tokens)
+    own = ids[worker::count] or [ids[worker % len(ids)]]
+    return {i: tokens[i] for i in own}
+
+
+async def start_clients(worker: int, count: int) -> None:
+    async def start_client(client_id, token):
+        try:
+            client = await Client(
+                name=f"worker{worker}-{client_id}",
+                api_id=API_ID,
+                api_hash=API_HASH,
+                bot_token=token,
+                sleep_threshold=SLEEP_THRESHOLD,
+                no_updates=True,
+                in_memory=True
+            ).start()
+            return client_id, client
+        except Exception:
+            logging.error(f"Worker {worker} failed starting Client - {client_id} Error:", exc_info=True)
+
+    clients = await asyncio.gather(*[start_client(i, token) for i, token in worker_tokens(worker, count).items()])
+    # Clients are indexed from 0 inside every worker, the scheduler only sees its own.
+    for index, (client_id, client) in enumerate(sorted(c for c in clients if c)):
+        multi_clients[index] = client
+        work_loads[index] = 0
+        logging.info(f"Worker {worker} serves with fleet client {client_id} as client {index}")
+    if not multi_clients:
+        raise RuntimeError(f"Worker {worker} could not start any client")
+
+
+async def serve(worker: int, count: int) -> None:
+    """
+    Runs a stream-only worker: a share of the bot fleet without updates, a share of
+    the chunk cache budget and the stream routes on PORT with SO_REUSEPORT, so the
+    kernel spreads the connections over every worker.
+    The file index lives in Mongo and the chunk cache on disk, both are shared by every worker.
+    """
+    await start_clients(worker, count)
+    StreamBot.username = BOT_USERNAME
+    await asyncio.to_thread(chunk_cache.start)
+    chunk_cache.partition(worker, count)
+    asyncio.create_task(media_sessions.start(await get_indexed_dc_ids()))
+    asyncio.create_task(loop_lag.run())
+    app = web.AppRunner(await web_server())
+    await app.setup()
+    await web.TCPSite(app, "0.0.0.0", PORT, reuse_port=True).start()
+    logging.info(f"Stream worker {worker}/{count} listening on port {PORT}")
+    await asyncio.Event().wait()
+
+
+def terminate_workers() -> None:
+    """Stops the worker processes still running, they would keep PORT bound next to the next ones."""
+    for process in list(worker_processes):
+        if process.returncode is None:
+            try:
+                process.terminate()
+            except ProcessLookupError:
+                pass
+
+
+async def supervise(worker: int, count: int) -> None:
+    while True:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "Zahid.server.worker", str(worker), str(count)
+        )
+        worker_processes.add(process)
+        try:
+            code = await process.wait()
+        finally:
+            worker_processes.discard(process)
+            if process.returncode is None:
+                # Cancelled while the worker runs, e.g. the control process is stopping.
+                try:
+                    process.terminate()
+                except ProcessLookupError:
+                    pass
+        logging.warning(f"Stream worker {worker} exited with code {code}, restarting in {RESTART_DELAY}s")
+        await asyncio.sleep(RESTART_DELAY)
+
+
+async def run_workers(count: int) -> None:
+    """Starts count stream workers from the control process and restarts the ones that exit."""
+    # A KeyboardInterrupt stops the loop without cancelling supervise, the workers are stopped on exit.
+    atexit.register(terminate_workers)
+    await asyncio.gather(*[supervise(worker, count) for worker in range(count)])
+
+
+if __name__ == "__main__":
+    worker, count = int(sys.argv[1]), int(sys.argv[2])
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f"%(asctime)s - worker{worker} - %(name)s - %(levelname)s - %(message)s",
+        force=True,
+    )
+    logging.getLogger("pyrogram").setLevel(logging.ERROR)
+    asyncio.get_event_loop().run_until_complete(serve(worker, count))
@@ -0,0 +1,79 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+
+class LRUCache:
+    def __init__(self, name: str, max_entries: int, ttl: float):
+        """An in-memory cache with a size cap, per-entry expiry and LRU eviction.
+        attributes:
+            name: the name reported in the stats.
+            max_entries: the maximum number of entries, the least recently used one is evicted past it.
+            ttl: the number of seconds an entry stays valid after it was stored.
+            entries: key -> [value, expires_at, last_used], in least recently used order.
+            hits, misses, evictions: counters reported by stats().
+        """
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: "OrderedDict[Hashable, List[Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self.entries.get(key)
+        return entry is not None and entry[1] > time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self.entries.get(key)
+        now = time.monotonic()
+        if entry is None or entry[1] <= now:
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return default
+        entry[2] = now
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        now = time.monotonic()
+        self.entries[key] = [value, now + (self.ttl if ttl is None else ttl), now]
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self.entries.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def expiring(self, within: float, used_within: float) -> List[Hashable]:
+        """
+        Returns the keys that expire in the next `within` seconds but were
+        used in the last `used_within` seconds, i.e. the ones worth refreshing.
+        """
+        now = time.monotonic()
+        return [
+            key for key, (_, expires_at, last_used) in self.entries.items()
+            if expires_at - now <= within and now - last_used <= used_within
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0,
+        }
@@ -0,0 +1,159 @@
+import os
+import mmap
+import zlib
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Optional
+from config import CHUNK_CACHE_DIR, CHUNK_CACHE_SIZE
+
+
+class ChunkCache:
+    def __init__(self, path: str, max_size: int):
+        """A size bounded on-disk cache of streamed file parts.
+        attributes:
+            path: the directory the parts are stored in.
+            max_size: the total size in bytes the cache may use, 0 disables it.
+            entries: the cached part keys with their size, in least recently used order.
+
+        Parts are content-addressed by (media_id, offset, limit), so the same part of a
+        file is shared by every client and every request that streams it. Reads are
+        memory-mapped and handed out as memoryviews, the least recently used parts are
+        evicted once the total size goes over max_size.
+        With stream workers every process owns the parts it wrote and a share of the
+        budget, parts written by other workers are still read from the shared directory.
+        The cache stays off until start() has indexed the directory.
+        """
+        self.path = path
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.shared = False
+        self.started = False
+        self.entries: "OrderedDict[str, int]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.started and self.max_size > 0
+
+    def start(self) -> None:
+        """
+        Creates the directory and indexes the parts already in it, called once on startup.
+        """
+        if self.started or self.max_size <= 0:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        self.load()
+        self.started = True
+
+    @staticmethod
+    def key(media_id: int, offset: int, limit: int) -> str:
+        return f"{media_id}_{offset}_{limit}"
+
+    def file_path(self, key: str) -> str:
+        return os.path.join(self.path, key)
+
+    def load(self) -> None:
+        """
+        Indexes the parts left on disk by a previous run, oldest access first.
+        """
+        found = []
+        for name in os.listdir(self.path):
+            path = self.file_path(name)
+            if name.endswith(".tmp"):
+                os.remove(path)
+                continue
+            stat = os.stat(path)
+            found.append((stat.st_atime, name, stat.st_size))
+        for _, name, size in sorted(found):
+            self.entries[name] = size
+            self.size += size
+        self.evict()
+        logging.info(f"Chunk cache loaded {len(self.entries)} parts ({self.size} bytes) from {self.path}")
+
+    def partition(self, worker: int, count: int) -> None:
+        """
+        Makes this process one of count stream workers sharing the directory: it keeps
+        1/count of the budget and only owns the parts left on disk that hash to it,
+        so every leftover part is evicted by exactly one worker.
+        """
+        if not self.enabled or count <= 1:
+            return
+        self.shared = True
+        self.max_size //= count
+        for key in list(self.entries):
+            if zlib.crc32(key.encode()) % count != worker:
+                self.size -= self.entries.pop(key)
+        self.evict()
+
+    def read(self, key: str) -> Optional[memoryview]:
+        try:
+            with open(self.file_path(key), "rb") as f:
+                return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def write(self, key: str, data: bytes) -> None:
+        # Write to a temporary file first so a reader never maps a half written part.
+        path = self.file_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def evict(self) -> None:
+        while self.size > self.max_size and self.entries:
+            key, size = self.entries.popitem(last=False)
+            self.size -= size
+            try:
+                os.remove(self.file_path(key))
+            except FileNotFoundError:
+                pass
+            logging.debug(f"Evicted part {key} from the chunk cache")
+
+    async def get(self, media_id: int, offset: int, limit: int) -> Optional[memoryview]:
+        """
+        Returns the cached part as a memoryview over the mapped file, or None on a miss.
+        """
+        if not self.enabled or media_id is None:
+            return None
+        key = self.key(media_id, offset, limit)
+        if key not in self.entries:
+            # Another worker may have fetched it, its owner takes care of evicting it.
+            chunk = await asyncio.to_thread(self.read, key) if self.shared else None
+            if chunk is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return chunk
+        self.entries.move_to_end(key)
+        chunk = await asyncio.to_thread(self.read, key)
+        if chunk is None:
+            self.size -= self.entries.pop(key, 0)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return chunk
+
+    async def put(self, media_id: int, offset: int, limit: int, data: bytes) -> None:
+        """
+        Stores a part fetched from Telegram, evicting old parts to stay within max_size.
+        """
+        if not self.enabled or media_id is None or not data or len(data) > self.max_size:
+            return
+        key = self.key(media_id, offset, limit)
+        if key in self.entries:
+            return
+        try:
+            await asyncio.to_thread(self.write, key, data)
+        except OSError:
+            logging.warning(f"Failed to write part {key} to the chunk cache", exc_info=True)
+            return
+        if key not in self.entries:
+            self.entries[key] = len(data)
+            self.size += len(data)
+        self.evict()
+
+
+chunk_cache = ChunkCache(CHUNK_CACHE_DIR, CHUNK_CACHE_SIZE)
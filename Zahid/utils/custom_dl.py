@@ -1,37 +1,108 @@
-import math
+import time
 import asyncio
 import logging
-from config import DB_CHANNEL
-from typing import Dict, Union
-from Zahid.bot import work_loads
+from collections import deque
+from config import PREFETCH_PARTS, FILE_ID_CACHE_SIZE, FILE_ID_CACHE_TTL, FILE_ID_CACHE_REFRESH
+from typing import AsyncGenerator, Dict, List, Optional, Set, Tuple, Union
+from Zahid.bot import multi_clients, work_loads
+from Zahid.bot.media_sessions import media_sessions
+from Zahid.bot.scheduler import scheduler
 from pyrogram import Client, utils, raw
-from .file_properties import get_file_ids
-from pyrogram.session import Session, Auth
-from pyrogram.errors import AuthBytesInvalid
-from Zahid.server.exceptions import FIleNotFound
+from pyrogram.errors import FloodWait, FileReferenceExpired, InternalServerError, ServiceUnavailable
+from .file_properties import resolve_file_ids
+from .chunk_cache import chunk_cache
+from .singleflight import SingleFlight
+from .cache import LRUCache
+from pyrogram.session import Session
+from Zahid.server.exceptions import FIleNotFound, PartUnavailable
 from pyrogram.file_id import FileId, FileType, ThumbnailSource
 
 
+# GetFile requests in flight across every client and stream, keyed by (media_id, offset, limit).
+part_flights = SingleFlight("GetFile")
+# File IDs by message ID and their lookups, shared by the ByteStreamer of every client.
+cached_file_ids = LRUCache("file_ids", FILE_ID_CACHE_SIZE, FILE_ID_CACHE_TTL)
+property_flights = SingleFlight("get_file_properties")
+# ByteStreamer of every client by client.
+class_cache = {}
+
+
+# GetFile limits must be a power of two between 4 KiB and 1 MiB with the offset aligned to them.
+MIN_CHUNK_SIZE = 4 * 1024
+MAX_CHUNK_SIZE = 1024 * 1024
+# Seconds the first part of a range may take at the observed throughput of a client.
+FIRST_PART_TIME = 0.25
+# Attempts per client for a failing part, with exponential backoff from RETRY_BACKOFF seconds.
+PART_RETRIES = 3
+RETRY_BACKOFF = 0.5
+# Errors a later attempt at the same part may not get, Telegram's 500 and 503 ("Timeout") included.
+TRANSIENT_ERRORS = (asyncio.TimeoutError, TimeoutError, OSError, InternalServerError, ServiceUnavailable)
+# FloodWaits up to this many seconds are waited out when no other client can take over.
+MAX_FLOOD_WAIT = 30
+
+
+def plan_parts(from_bytes: int, until_bytes: int, chunk_size: int) -> List[Tuple[int, int]]:
+    """
+    Splits the range from_bytes..until_bytes into (offset, limit) GetFile requests.
+    The limit starts at chunk_size and doubles whenever the next offset is aligned
+    to the doubled size, until MAX_CHUNK_SIZE, so every request stays MTProto-legal.
+    """
+    parts = []
+    limit = chunk_size
+    offset = from_bytes - (from_bytes % limit)
+    while offset <= until_bytes:
+        parts.append((offset, limit))
+        offset += limit
+        if limit < MAX_CHUNK_SIZE and offset % (limit * 2) == 0:
+            limit *= 2
+    return parts
+
+
+def get_byte_streamer(index: int) -> "ByteStreamer":
+    client = multi_clients[index]
+    if client in class_cache:
+        logging.debug(f"Using cached ByteStreamer object for client {index}")
+        return class_cache[client]
+    logging.debug(f"Creating new ByteStreamer object for client {index}")
+    tg_connect = ByteStreamer(client, index)
+    class_cache[client] = tg_connect
+    return tg_connect
+
+
+def _consume_exception(task: asyncio.Task) -> None:
+    # Read-ahead parts may be abandoned when the client disconnects, mark
+    # their exceptions as retrieved so asyncio does not log them.
+    if not task.cancelled():
+        task.exception()
+
+
 class ByteStreamer:
-    def __init__(self, client: Client):
-        """A custom class that holds the cache of a specific client and class functions.
+    refresh_task: Optional[asyncio.Task] = None
+
+    def __init__(self, client: Client, index: int = 0):
+        """A custom class that holds the client used for streaming and class functions.
         attributes:
-            client: the client that the cache is for.
-            cached_file_ids: a dict of cached file IDs.
-            cached_file_properties: a dict of cached file properties.
+            client: the client that the streamer is for.
+            index: the index of the client in multi_clients, its throughput and errors are reported to the scheduler under it.
+            cached_file_ids: the LRU + TTL cache of file IDs, shared by every ByteStreamer.
         
         functions:
             generate_file_properties: returns the properties for a media of a specific message contained in Tuple.
+            refresh_file_properties: re-resolves a message from Telegram once its file_reference expired.
             generate_media_session: returns the media session for the DC that contains the media file.
+            get_part: fetch a single part of the media file, from the cache or a shared in-flight request.
             yield_file: yield a file from telegram servers for streaming.
+            refresh_cache: refresh the cached file IDs whose file_reference is about to expire.
             
         This is a modified version of the <https://github.com/eyaadh/megadlbot_oss/blob/master/mega/telegram/utils/custom_download.py>
         Thanks to Eyaadh <https://github.com/eyaadh>
         """
-        self.clean_timer = 30 * 60
         self.client: Client = client
-        self.cached_file_ids: Dict[int, FileId] = {}
-        asyncio.create_task(self.clean_cache())
+        self.index: int = index
+        self.cached_file_ids: LRUCache = cached_file_ids
+        self.property_flights: SingleFlight = property_flights
+        if ByteStreamer.refresh_task is None:
+            ByteStreamer.refresh_task = asyncio.create_task(self.refresh_cache())
 
     async def get_file_properties(self, id: int) -> FileId:
         """
@@ -39,80 +110,44 @@ class ByteStreamer:
         if the properties are cached, then it'll return the cached results.
         or it'll generate the properties from the Message ID and cache them.
         """
-        if id not in self.cached_file_ids:
-            await self.generate_file_properties(id)
-            logging.debug(f"Cached file properties for message with ID {id}")
-        return self.cached_file_ids[id]
+        file_id = self.cached_file_ids.get(id)
+        if file_id is None:
+            # Concurrent requests for the same message share one lookup.
+            return await self.property_flights.do(id, lambda: self.generate_file_properties(id))
+        return file_id
     
-    async def generate_file_properties(self, id: int) -> FileId:
+    async def refresh_file_properties(self, id: int) -> FileId:
+        """
+        Re-resolves the properties of a message from Telegram, bypassing the file index,
+        and replaces the cached entry. Used when a GetFile fails with FILE_REFERENCE_EXPIRED,
+        concurrent refreshes of the same message share one lookup.
+        """
+        logging.info(f"Refreshing the file reference of message with ID {id}")
+        return await self.property_flights.do(
+            ("refresh", id), lambda: self.generate_file_properties(id, refresh=True)
+        )
+
+    async def generate_file_properties(self, id: int, refresh: bool = False) -> FileId:
         """
         Generates the properties of a media file on a specific message.
         returns ths properties in a FIleId class.
         """
-        file_id = await get_file_ids(self.client, DB_CHANNEL, id)
+        file_id = await resolve_file_ids(self.client, id, refresh)
         logging.debug(f"Generated file ID and Unique ID for message with ID {id}")
         if not file_id:
             logging.debug(f"Message with ID {id} not found")
             raise FIleNotFound
-        self.cached_file_ids[id] = file_id
+        self.cached_file_ids.set(id, file_id)
         logging.debug(f"Cached media message with ID {id}")
-        return self.cached_file_ids[id]
+        return file_id
 
     async def generate_media_session(self, client: Client, file_id: FileId) -> Session:
         """
-        Generates the media session for the DC that contains the media file.
+        Returns a media session for the DC that contains the media file.
         This is required for getting the bytes from Telegram servers.
+        Sessions are pooled, pre-warmed and health checked by the MediaSessionManager.
         """
-
-        media_session = client.media_sessions.get(file_id.dc_id, None)
-
-        if media_session is None:
-            if file_id.dc_id != await client.storage.dc_id():
-                media_session = Session(
-                    client,
-                    file_id.dc_id,
-                    await Auth(
-                        client, file_id.dc_id, await client.storage.test_mode()
-                    ).create(),
-                    await client.storage.test_mode(),
-                    is_media=True,
-                )
-                await media_session.start()
-
-                for _ in range(6):
-                    exported_auth = await client.invoke(
-                        raw.functions.auth.ExportAuthorization(dc_id=file_id.dc_id)
-                    )
-
-                    try:
-                        await media_session.send(
-                            raw.functions.auth.ImportAuthorization(
-                                id=exported_auth.id, bytes=exported_auth.bytes
-                            )
-                        )
-                        break
-                    except AuthBytesInvalid:
-                        logging.debug(
-                            f"Invalid authorization bytes for DC {file_id.dc_id}"
-                        )
-                        continue
-                else:
-                    await media_session.stop()
-                    raise AuthBytesInvalid
-            else:
-                media_session = Session(
-                    client,
-                    file_id.dc_id,
-                    await client.storage.auth_key(),
-                    await client.storage.test_mode(),
-                    is_media=True,
-                )
-                await media_session.start()
-            logging.debug(f"Created media session for DC {file_id.dc_id}")
-            client.media_sessions[file_id.dc_id] = media_session
-        else:
-            logging.debug(f"Using cached media session for DC {file_id.dc_id}")
-        return media_session
+        return await media_sessions.get(client, file_id.dc_id)
 
 
     @staticmethod
@@ -160,72 +195,238 @@ class ByteStreamer:
             )
         return location
 
+    def choose_chunk_size(self, req_length: int) -> int:
+        """
+        Returns the GetFile limit to start a range with: the smallest power of two
+        covering the range, so a player probing a few KiB gets a small and fast part,
+        capped by what this client fetches in FIRST_PART_TIME at its observed throughput.
+        plan_parts then ramps the limit up to 1 MiB for long ranges.
+        """
+        target = req_length
+        throughput = scheduler.throughput(self.index)
+        if throughput:
+            target = min(target, throughput * FIRST_PART_TIME)
+        chunk_size = MIN_CHUNK_SIZE
+        while chunk_size < target and chunk_size < MAX_CHUNK_SIZE:
+            chunk_size *= 2
+        return chunk_size
+
+    async def get_part(self, media_session: Session, location, file_id: FileId, offset: int, chunk_size: int) -> bytes:
+        """
+        Fetches a single part of the media file starting at the given offset.
+        Parts are served from the chunk cache when present and stored in it on a miss,
+        concurrent misses for the same part share a single GetFile request.
+        """
+        chunk = await chunk_cache.get(file_id.media_id, offset, chunk_size)
+        if chunk is not None:
+            return chunk
+        if file_id.media_id is None:
+            return await self.fetch_part(media_session, location, file_id, offset, chunk_size)
+        return await part_flights.do(
+            (file_id.media_id, offset, chunk_size),
+            lambda: self.fetch_part(media_session, location, file_id, offset, chunk_size),
+        )
+
+    async def fetch_part(self, media_session: Session, location, file_id: FileId, offset: int, chunk_size: int) -> bytes:
+        """
+        Requests a part of the media file from Telegram and stores it in the chunk cache.
+        The time it took and any FloodWait or connection error are reported to the scheduler.
+        """
+        started = time.monotonic()
+        try:
+            r = await media_session.send(
+                raw.functions.upload.GetFile(
+                    location=location, offset=offset, limit=chunk_size
+                ),
+            )
+        except FloodWait as e:
+            scheduler.record_flood_wait(self.index, e.value)
+            raise
+        except TRANSIENT_ERRORS:
+            scheduler.record_error(self.index)
+            raise
+        if isinstance(r, raw.types.upload.File):
+            scheduler.record_part(self.index, len(r.bytes), time.monotonic() - started)
+            await chunk_cache.put(file_id.media_id, offset, chunk_size, r.bytes)
+            return r.bytes
+        # e.g. upload.FileCdnRedirect, which this streamer does not follow.
+        raise PartUnavailable(f"GetFile at offset {offset} returned {type(r).__name__}")
+
     async def yield_file(
         self,
         file_id: FileId,
         index: int,
-        offset: int,
-        first_part_cut: int,
-        last_part_cut: int,
-        part_count: int,
+        from_bytes: int,
+        until_bytes: int,
         chunk_size: int,
-    ) -> Union[str, None]:
+        stripes: Optional[List[Tuple["ByteStreamer", FileId, int]]] = None,
+    ) -> AsyncGenerator[memoryview, None]:
         """
-        Custom generator that yields the bytes of the media file.
+        Custom generator that yields the bytes from_bytes..until_bytes (inclusive) of the
+        media file as memoryviews. The range is fetched in parts planned by plan_parts,
+        starting with chunk_size.
+        Up to PREFETCH_PARTS GetFile requests per client are kept in flight, a new one
+        is only issued once the consumer takes a part, so a slow client never buffers
+        more than the read-ahead window.
+        stripes is an optional list of (ByteStreamer, FileId, index) of other clients,
+        parts are then fetched round-robin across this client and the stripes and
+        reassembled in order.
+        Failing parts are retried and moved to other clients by fetch, an error is only
+        raised once no client can serve the part, so the body is never silently truncated.
         Modded from <https://github.com/eyaadh/megadlbot_oss/blob/master/mega/telegram/utils/custom_download.py#L20>
         Thanks to Eyaadh <https://github.com/eyaadh>
         """
-        client = self.client
-        work_loads[index] += 1
-        logging.debug(f"Starting to yielding file with client {index}.")
-        media_session = await self.generate_media_session(client, file_id)
+        fetchers = [(self, file_id, index)] + list(stripes or [])
+        serving = [client_index for _, _, client_index in fetchers]
+        for client_index in serving:
+            work_loads[client_index] += 1
+        logging.debug(f"Starting to yielding file with clients {serving}.")
+
+        parts = plan_parts(from_bytes, until_bytes, chunk_size)
+        part_count = len(parts)
+        first_part_cut = from_bytes - parts[0][0]
+        last_part_cut = until_bytes - parts[-1][0] + 1
 
         current_part = 1
-        location = await self.get_location(file_id)
+        pending = deque()
+        next_part = 1
+
+        # Every slot fetches a share of the parts round-robin, a slot whose client keeps
+        # failing is moved to another client with all of its remaining parts.
+        slots = [(streamer, await streamer.get_location(slot_file_id), slot_file_id) for streamer, slot_file_id, _ in fetchers]
+        failed: Set[int] = set()
+        moves: Dict[int, asyncio.Lock] = {}
+
+        async def move_slot(slot: int, streamer: "ByteStreamer") -> bool:
+            """Moves a slot to the best client not serving or failing this stream, returns whether it moved."""
+            async with moves.setdefault(slot, asyncio.Lock()):
+                if slots[slot][0] is not streamer:
+                    # Another part of this slot already moved it.
+                    return True
+                failed.add(streamer.index)
+                ranking = scheduler.rank(file_id.dc_id, until_bytes - from_bytes + 1, exclude=failed | set(serving))
+                if not ranking:
+                    return False
+                helper = ranking[0]
+                # File IDs are shared by every client, only the client of the slot changes.
+                slots[slot] = (get_byte_streamer(helper), slots[slot][1], slots[slot][2])
+                serving.append(helper)
+                work_loads[helper] += 1
+                logging.info(f"Moved the remaining parts of client {streamer.index} to client {helper}")
+                return True
+
+        async def refresh_slots(streamer: "ByteStreamer", stale_file_id: FileId) -> None:
+            """Re-resolves an expired file ID and points every slot still using it at the fresh one."""
+            if all(slot_file_id is not stale_file_id for _, _, slot_file_id in slots):
+                # Another part already refreshed it.
+                return
+            fresh_file_id = await streamer.refresh_file_properties(stale_file_id.message_id)
+            location = await streamer.get_location(fresh_file_id)
+            for i, (slot_streamer, _, slot_file_id) in enumerate(slots):
+                if slot_file_id is stale_file_id:
+                    slots[i] = (slot_streamer, location, fresh_file_id)
+
+        async def fetch(slot: int, part_offset: int, part_size: int) -> bytes:
+            """
+            Fetches a part through the client of its slot, retrying the same offset with
+            backoff on timeouts, connection errors and Telegram 5xx and waiting out short FloodWaits.
+            An expired file_reference is refreshed once and the same offset is requested again,
+            so is a reply that is not the part.
+            FloodWaits and repeated errors move the slot to another client when one is available.
+            """
+            attempt = 0
+            refreshed = False
+            unavailable = False
+            while True:
+                streamer, location, part_file_id = slots[slot]
+                try:
+                    # Every attempt takes the next session of the pool, so a broken one is skipped.
+                    media_session = await streamer.generate_media_session(streamer.client, part_file_id)
+                    return await streamer.get_part(media_session, location, part_file_id, part_offset, part_size)
+                except FileReferenceExpired:
+                    if refreshed or getattr(part_file_id, "message_id", None) is None:
+                        raise
+                    refreshed = True
+                    await refresh_slots(streamer, part_file_id)
+                    continue
+                except FloodWait as e:
+                    error, wait = e, e.value
+                except PartUnavailable:
+                    # e.g. a retried BadMsgNotification answered with something else than
+                    # the part, only a second one for the same offset is fatal.
+                    if unavailable:
+                        raise
+                    unavailable = True
+                    await asyncio.sleep(RETRY_BACKOFF)
+                    continue
+                except TRANSIENT_ERRORS as e:
+                    error, wait = e, RETRY_BACKOFF * 2 ** attempt
+                attempt += 1
+                logging.debug(f"Part at offset {part_offset} failed on client {streamer.index} ({attempt}): {error!r}")
+                if isinstance(error, FloodWait) or attempt > PART_RETRIES:
+                    if await move_slot(slot, streamer):
+                        attempt = 0
+                        continue
+                    if attempt > PART_RETRIES or wait > MAX_FLOOD_WAIT:
+                        raise error
+                await asyncio.sleep(wait)
 
         try:
-            r = await media_session.send(
-                raw.functions.upload.GetFile(
-                    location=location, offset=offset, limit=chunk_size
-                ),
-            )
-            if isinstance(r, raw.types.upload.File):
-                while True:
-                    chunk = r.bytes
-                    if not chunk:
-                        break
-                    elif part_count == 1:
-                        yield chunk[first_part_cut:last_part_cut]
-                    elif current_part == 1:
-                        yield chunk[first_part_cut:]
-                    elif current_part == part_count:
-                        yield chunk[:last_part_cut]
-                    else:
-                        yield chunk
-
-                    current_part += 1
-                    offset += chunk_size
-
-                    if current_part > part_count:
-                        break
-
-                    r = await media_session.send(
-                        raw.functions.upload.GetFile(
-                            location=location, offset=offset, limit=chunk_size
-                        ),
-                    )
-        except (TimeoutError, AttributeError):
-            pass
+            window = max(1, min(PREFETCH_PARTS * len(slots), part_count))
+
+            def schedule_next():
+                nonlocal next_part
+                if next_part > part_count:
+                    return
+                part_offset, part_size = parts[next_part - 1]
+                task = asyncio.ensure_future(fetch((next_part - 1) % len(slots), part_offset, part_size))
+                task.add_done_callback(_consume_exception)
+                pending.append(task)
+                next_part += 1
+
+            for _ in range(window):
+                schedule_next()
+
+            while pending:
+                chunk = await pending.popleft()
+                if not chunk:
+                    # Ending the body here would send a short file as a complete one.
+                    raise PartUnavailable(f"Empty part {current_part}/{part_count} of message {getattr(file_id, 'message_id', None)}")
+                # Slicing a memoryview cuts the edge parts without copying them.
+                chunk = memoryview(chunk)
+                if part_count == 1:
+                    yield chunk[first_part_cut:last_part_cut]
+                elif current_part == 1:
+                    yield chunk[first_part_cut:]
+                elif current_part == part_count:
+                    yield chunk[:last_part_cut]
+                else:
+                    yield chunk
+
+                current_part += 1
+                schedule_next()
         finally:
-            logging.debug("Finished yielding file with {current_part} parts.")
-            work_loads[index] -= 1
+            for task in pending:
+                task.cancel()
+            logging.debug(f"Finished yielding file with {current_part} parts.")
+            for client_index in serving:
+                work_loads[client_index] -= 1
 
     
-    async def clean_cache(self) -> None:
+    async def refresh_cache(self) -> None:
         """
-        function to clean the cache to reduce memory usage
+        Re-resolves the cached file IDs that are still in use shortly before they
+        expire, so popular files keep a fresh file_reference and never fall back to
+        a burst of get_messages calls. Unused entries are left to expire.
         """
         while True:
-            await asyncio.sleep(self.clean_timer)
-            self.cached_file_ids.clear()
-            logging.debug("Cleaned the cache")
+            await asyncio.sleep(FILE_ID_CACHE_REFRESH / 2)
+            ids = self.cached_file_ids.expiring(FILE_ID_CACHE_REFRESH, FILE_ID_CACHE_REFRESH)
+            for id in ids:
+                try:
+                    await self.property_flights.do(("refresh", id), lambda: self.generate_file_properties(id, refresh=True))
+                except Exception:
+                    logging.warning(f"Failed to refresh file properties for message with ID {id}", exc_info=True)
+                    self.cached_file_ids.pop(id)
+            if ids:
+                logging.debug(f"Refreshed {len(ids)} cached file IDs")
@@ -1,9 +1,13 @@
+import logging
+from datetime import timezone
 from pyrogram import Client
+from config import DB_CHANNEL
 from typing import Any, Optional
 from pyrogram.types import Message
 from pyrogram.file_id import FileId
 from pyrogram.raw.types.messages import Messages
 from Zahid.server.exceptions import FIleNotFound
+from plugins.database import save_file, get_stream_file
 
 
 async def parse_file_id(message: "Message") -> Optional[FileId]:
@@ -27,8 +31,60 @@ async def get_file_ids(client: Client, chat_id: int, id: int) -> Optional[FileId
     setattr(file_id, "mime_type", getattr(media, "mime_type", ""))
     setattr(file_id, "file_name", getattr(media, "file_name", ""))
     setattr(file_id, "unique_id", file_unique_id)
+    setattr(file_id, "date", message.date.astimezone(timezone.utc) if message.date else None)
+    setattr(file_id, "message_id", id)
+    if chat_id == DB_CHANNEL:
+        await index_message(message)
     return file_id
 
+async def get_indexed_file_ids(id: int) -> Optional[FileId]:
+    try:
+        media = await get_stream_file(id)
+    except Exception:
+        logging.warning(f"File index lookup failed for message with ID {id}", exc_info=True)
+        return None
+    if not media:
+        return None
+    file_id = FileId.decode(media.file_id)
+    setattr(file_id, "file_size", media.file_size)
+    setattr(file_id, "mime_type", media.mime_type or "")
+    setattr(file_id, "file_name", media.file_name)
+    setattr(file_id, "unique_id", media.file_unique_id)
+    # Mongo hands back naive datetimes in UTC.
+    setattr(file_id, "date", media.date.replace(tzinfo=timezone.utc) if media.date else None)
+    setattr(file_id, "message_id", id)
+    return file_id
+
+async def resolve_file_ids(client: Client, id: int, refresh: bool = False) -> Optional[FileId]:
+    """
+    Resolves a DB_CHANNEL message from the file index, falling back to Telegram.
+    refresh skips the index, whose file_reference may have expired, and re-indexes the message.
+    """
+    if not refresh:
+        file_id = await get_indexed_file_ids(id)
+        if file_id:
+            logging.debug(f"Resolved message with ID {id} from the file index")
+            return file_id
+    return await get_file_ids(client, DB_CHANNEL, id)
+
+async def index_message(message: "Message") -> None:
+    media = get_media_from_message(message)
+    if not media:
+        return
+    try:
+        await save_file(
+            message.id,
+            media.file_id,
+            media.file_unique_id,
+            getattr(media, "file_name", ""),
+            getattr(media, "file_size", 0),
+            getattr(media, "mime_type", None),
+            message.caption.html if message.caption else None,
+            message.date,
+        )
+    except Exception:
+        logging.warning(f"Failed to index message with ID {message.id}", exc_info=True)
+
 def get_media_from_message(message: "Message") -> Any:
     media_types = (
         "audio",
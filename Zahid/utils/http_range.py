@@ -0,0 +1,62 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, Tuple
+from Zahid.server.exceptions import RangeNotSatisfiable
+
+
+def parse_range(range_header: Optional[str], file_size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a Range header into an inclusive (from_bytes, until_bytes) pair.
+    Supports "bytes=a-b", "bytes=a-" and suffix ranges "bytes=-n".
+    Returns None when the whole file should be served: no header, another unit,
+    a malformed spec or a multi-range request (which we answer with a plain 200).
+    Raises RangeNotSatisfiable when the range lies outside of the file.
+    """
+    if not range_header:
+        return None
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start, sep, end = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if not start:
+            suffix = int(end)
+            if suffix <= 0 or file_size == 0:
+                raise RangeNotSatisfiable
+            return max(0, file_size - suffix), file_size - 1
+        from_bytes = int(start)
+        until_bytes = int(end) if end else file_size - 1
+    except ValueError:
+        return None
+    if from_bytes < 0 or (end and until_bytes < from_bytes):
+        return None
+    if from_bytes >= file_size:
+        raise RangeNotSatisfiable
+    return from_bytes, min(until_bytes, file_size - 1)
+
+
+def if_range_matches(if_range: Optional[str], etag: str, last_modified: Optional[datetime]) -> bool:
+    """
+    Returns whether a Range header may be honoured given the If-Range validator.
+    An entity tag must match strongly, a date must equal Last-Modified.
+    """
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith(("\"", "W/")):
+        return if_range == etag
+    if last_modified is None:
+        return False
+    try:
+        date = parsedate_to_datetime(if_range)
+    except (TypeError, ValueError):
+        return False
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return int(date.timestamp()) == int(last_modified.timestamp())
+
+
+def http_date(value: datetime) -> str:
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
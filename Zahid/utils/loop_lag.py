@@ -0,0 +1,48 @@
+import time
+import asyncio
+import logging
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.5, threshold: float = 0.1):
+        """Measures how late the event loop wakes up a sleeping task.
+        attributes:
+            interval: the seconds the monitor sleeps between samples.
+            threshold: lags above this many seconds are logged as a blocked loop.
+            last, max, average: the last, the worst and the EWMA lag in seconds.
+            blocked: the number of samples over the threshold.
+
+        Any lag is time the loop spent running something else without yielding,
+        a blocking call in a handler shows up here and stalls every stream with it.
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self.last = 0.0
+        self.max = 0.0
+        self.average = 0.0
+        self.samples = 0
+        self.blocked = 0
+
+    async def run(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - started - self.interval)
+            self.samples += 1
+            self.last = lag
+            self.max = max(self.max, lag)
+            self.average = lag if self.samples == 1 else 0.1 * lag + 0.9 * self.average
+            if lag > self.threshold:
+                self.blocked += 1
+                logging.warning(f"Event loop was blocked for {lag * 1000:.0f} ms")
+
+    def stats(self) -> dict:
+        return {
+            "last_ms": round(self.last * 1000, 1),
+            "average_ms": round(self.average * 1000, 1),
+            "max_ms": round(self.max * 1000, 1),
+            "blocked": self.blocked,
+        }
+
+
+loop_lag = LoopLagMonitor()
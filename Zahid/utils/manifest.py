@@ -0,0 +1,107 @@
+import json
+import struct
+import logging
+from typing import Iterable, Iterator, List, Optional, Tuple
+from pyrogram import Client
+from config import DB_CHANNEL, MANIFEST_CACHE_SIZE, MANIFEST_CACHE_TTL
+from plugins.database import save_manifest, get_manifest
+from .cache import LRUCache
+
+# Encoding version, then one (channel_id, first msg_id, count) per run of consecutive messages.
+MANIFEST_VERSION = 1
+HEADER = struct.Struct("<B")
+RUN = struct.Struct("<qII")
+
+
+class ManifestBuilder:
+    def __init__(self):
+        """Builds a manifest one message at a time, only the runs are kept in memory."""
+        self.runs: List[List[int]] = []
+        self.count = 0
+
+    def add(self, channel_id: int, msg_id: int) -> None:
+        self.count += 1
+        run = self.runs[-1] if self.runs else None
+        if run and run[0] == channel_id and run[1] + run[2] == msg_id:
+            run[2] += 1
+        else:
+            self.runs.append([channel_id, msg_id, 1])
+
+    def encode(self) -> bytes:
+        return HEADER.pack(MANIFEST_VERSION) + b"".join(RUN.pack(*run) for run in self.runs)
+
+
+def encode_manifest(entries: Iterable[Tuple[int, int]]) -> bytes:
+    """
+    Encodes (channel_id, msg_id) pairs as runs of consecutive message IDs,
+    a batch of a whole channel range takes 16 bytes instead of one JSON object per file.
+    """
+    builder = ManifestBuilder()
+    for channel_id, msg_id in entries:
+        builder.add(channel_id, msg_id)
+    return builder.encode()
+
+
+def decode_runs(data: bytes) -> Iterator[Tuple[int, int, int]]:
+    """Yields the (channel_id, first msg_id, count) runs of an encoded manifest."""
+    (version,) = HEADER.unpack_from(data)
+    if version != MANIFEST_VERSION:
+        raise ValueError(f"Unknown manifest version {version}")
+    yield from RUN.iter_unpack(memoryview(data)[HEADER.size:])
+
+
+def run_count(data: bytes) -> int:
+    return (len(data) - HEADER.size) // RUN.size
+
+
+class ManifestStore:
+    def __init__(self):
+        """Keeps the manifests of BATCH links in Mongo with an LRU + TTL cache in front.
+        attributes:
+            manifests: the encoded manifests by batch ID, expanded run by run when delivered.
+
+        Batch IDs are the DB_CHANNEL message IDs the links were created with. Links
+        made before the store existed point at a JSON document in DB_CHANNEL, it is
+        read in memory on first use and migrated to Mongo.
+        """
+        self.manifests = LRUCache("batch_manifests", MANIFEST_CACHE_SIZE, MANIFEST_CACHE_TTL)
+
+    async def save(self, batch_id: int, entries: List[Tuple[int, int]]) -> None:
+        builder = ManifestBuilder()
+        for channel_id, msg_id in entries:
+            builder.add(channel_id, msg_id)
+        await self.save_builder(batch_id, builder)
+
+    async def save_builder(self, batch_id: int, builder: ManifestBuilder) -> None:
+        data = builder.encode()
+        await save_manifest(batch_id, data, builder.count)
+        self.manifests.set(batch_id, data)
+        logging.debug(f"Saved manifest {batch_id} with {builder.count} files in {run_count(data)} runs")
+
+    async def get(self, client: Client, batch_id: int) -> Optional[bytes]:
+        """Returns the encoded manifest of a batch, None when the batch has no files or does not exist."""
+        data = self.manifests.get(batch_id)
+        if data is None:
+            data = await get_manifest(batch_id)
+            if data is not None:
+                self.manifests.set(batch_id, data)
+        if data is None:
+            entries = await self.load_legacy(client, batch_id)
+            if entries is not None:
+                await self.save(batch_id, entries)
+                data = self.manifests.get(batch_id)
+        return data if data and run_count(data) else None
+
+    async def load_legacy(self, client: Client, batch_id: int) -> Optional[List[Tuple[int, int]]]:
+        msg = await client.get_messages(DB_CHANNEL, batch_id)
+        if msg.empty or not msg.document:
+            return None
+        try:
+            file = await client.download_media(msg.document.file_id, in_memory=True)
+            return [(int(entry["channel_id"]), int(entry["msg_id"])) for entry in json.loads(bytes(file.getbuffer()))]
+        except Exception:
+            logging.warning(f"Failed to read the JSON manifest of batch {batch_id}", exc_info=True)
+            return None
+
+
+manifests = ManifestStore()
@@ -0,0 +1,165 @@
+import time
+from typing import Dict, Optional
+from pymongo import monitoring, ReturnDocument
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
+from config import DB_URI, MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME, MONGO_COMPRESSORS, USER_CACHE_SIZE, USER_CACHE_TTL
+from .cache import LRUCache
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Counts the connections and checkouts of every pool, for sizing MONGO_MAX_POOL_SIZE."""
+
+    def __init__(self):
+        self.created = 0
+        self.closed = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.checkouts = 0
+        self.waiting = 0
+        self.peak_waiting = 0
+        self.failed_checkouts = 0
+        self.cleared = 0
+        self.started = time.monotonic()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self.cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.closed += 1
+
+    def connection_check_out_started(self, event):
+        self.waiting += 1
+        self.peak_waiting = max(self.peak_waiting, self.waiting)
+
+    def connection_check_out_failed(self, event):
+        self.waiting -= 1
+        self.failed_checkouts += 1
+
+    def connection_checked_out(self, event):
+        self.waiting -= 1
+        self.checkouts += 1
+        self.checked_out += 1
+        self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+    def connection_checked_in(self, event):
+        self.checked_out -= 1
+
+    def stats(self) -> dict:
+        return {
+            "clients": len(clients),
+            "max_pool_size": MONGO_MAX_POOL_SIZE,
+            "open": self.created - self.closed,
+            "in_use": self.checked_out,
+            "peak_in_use": self.peak_checked_out,
+            "peak_waiting": self.peak_waiting,
+            "checkouts_per_second": round(self.checkouts / max(1, time.monotonic() - self.started), 2),
+            "failed_checkouts": self.failed_checkouts,
+            "pool_clears": self.cleared,
+        }
+
+
+pool_stats = PoolStats()
+# Clients by URI, DB_URI and CLONE_DB_URI share one pool when they point at the same cluster.
+clients: Dict[str, AsyncIOMotorClient] = {}
+
+
+def get_client(uri: str = DB_URI) -> AsyncIOMotorClient:
+    """
+    Returns the process wide Motor client for a URI, every database and repository
+    of the bot, the clone bots and the stream server is built on these.
+    """
+    if uri not in clients:
+        options = dict(
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=MONGO_MAX_IDLE_TIME * 1000,
+            event_listeners=[pool_stats],
+        )
+        if MONGO_COMPRESSORS:
+            options["compressors"] = MONGO_COMPRESSORS
+        clients[uri] = AsyncIOMotorClient(uri, **options)
+    return clients[uri]
+
+
+# One pooled async client shared by the plugins and the clone plugins, handlers
+# await every query instead of blocking the event loop with pymongo.
+mongo_client = get_client(DB_URI)
+# all the data of clone bots will be stored in this database name and it will contain token and name
+clones_db = mongo_client["cloned-bots"]
+# Shortener settings of main bot users, written through on every update.
+user_settings = LRUCache("user_settings", USER_CACHE_SIZE, USER_CACHE_TTL)
+
+
+async def add_clone_bot(details: dict) -> None:
+    await clones_db.bots.insert_one(details)
+
+
+async def get_clone_bot(bot_id: int) -> Optional[dict]:
+    return await clones_db.bots.find_one({"bot_id": bot_id})
+
+
+async def get_clone_bot_by_token(bot_token: str) -> Optional[dict]:
+    return await clones_db.bots.find_one({"token": bot_token})
+
+
+async def delete_clone_bot(bot_token: str) -> None:
+    await clones_db.bots.delete_one({"token": bot_token})
+
+
+def get_clone_bots():
+    """Returns an async cursor over every cloned bot."""
+    return clones_db.bots.find()
+
+
+async def get_shortener_user(
+    user_id: int,
+    collection: Optional[AsyncIOMotorCollection] = None,
+    cache: Optional[LRUCache] = None,
+) -> dict:
+    """
+    Returns the shortener settings of a user, creating them on first use.
+    collection and cache default to the main bot's, clone bots pass their own.
+    Served from the cache, a miss costs a single atomic upsert.
+    """
+    collection = clones_db.user if collection is None else collection
+    cache = user_settings if cache is None else cache
+    user = cache.get(user_id)
+    if user is None:
+        user = await collection.find_one_and_update(
+            {"user_id": user_id},
+            {"$setOnInsert": {"shortener_api": None, "base_site": None}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        cache.set(user_id, user)
+    return user
+
+
+async def update_shortener_user(
+    user_id: int,
+    value: dict,
+    collection: Optional[AsyncIOMotorCollection] = None,
+    cache: Optional[LRUCache] = None,
+) -> None:
+    """Updates the shortener settings of a user and writes them through to the cache."""
+    collection = clones_db.user if collection is None else collection
+    cache = user_settings if cache is None else cache
+    user = await collection.find_one_and_update(
+        {"user_id": user_id},
+        {"$set": value},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    cache.set(user_id, user)
@@ -0,0 +1,82 @@
+import time
+import asyncio
+from typing import Dict, Hashable, Optional
+
+# Seconds between two sweeps of the idle buckets of a RateLimiter.
+SWEEP_INTERVAL = 60
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """A token bucket shared by every task sending through the same client or chat.
+        attributes:
+            rate: the tokens added per second.
+            capacity: the most tokens that can be saved up, the largest burst.
+            paused_until: the monotonic time before which no token is handed out.
+
+        Waiters are served in FIFO order. pause() stops the whole bucket, so a
+        FloodWait hit by one task holds back every task using the bucket instead
+        of only the one that got it.
+        """
+        self.rate = rate
+        self.capacity = burst or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if self.paused_until > now:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    def idle(self, now: float) -> bool:
+        """True when nobody waits on the bucket and it has refilled, it then acts like a new one."""
+        return (
+            not self.lock.locked()
+            and self.paused_until <= now
+            and self.tokens + (now - self.updated) * self.rate >= self.capacity
+        )
+
+
+class RateLimiter:
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """Keeps one TokenBucket per key, e.g. per client or per chat, created on first use.
+        Idle buckets are dropped every SWEEP_INTERVAL seconds, so keys seen once don't pile up.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.buckets: Dict[Hashable, TokenBucket] = {}
+        self.swept = time.monotonic()
+
+    def sweep(self, now: float) -> None:
+        self.swept = now
+        for key in [key for key, bucket in self.buckets.items() if bucket.idle(now)]:
+            del self.buckets[key]
+
+    def bucket(self, key: Hashable) -> TokenBucket:
+        now = time.monotonic()
+        if now - self.swept >= SWEEP_INTERVAL:
+            self.sweep(now)
+        if key not in self.buckets:
+            self.buckets[key] = TokenBucket(self.rate, self.burst)
+        return self.buckets[key]
+
+    async def acquire(self, key: Hashable) -> None:
+        await self.bucket(key).acquire()
+
+    def pause(self, key: Hashable, seconds: float) -> None:
+        self.bucket(key).pause(seconds)
@@ -1,17 +1,17 @@
-import jinja2
-from config import DB_CHANNEL, URL
-from Zahid.bot import StreamBot
+from config import URL
 from Zahid.utils.human_readable import humanbytes
-from Zahid.utils.file_properties import get_file_ids
+from Zahid.utils.custom_dl import get_byte_streamer
 from Zahid.server.exceptions import InvalidHash
 import urllib.parse
 import logging
-import aiohttp
+
+# Compiled templates by path, jinja2 is only imported once a page is rendered.
+templates = {}
 
 
 async def render_page(id, secure_hash, src=None):
-    file = await StreamBot.get_messages(int(DB_CHANNEL), int(id))
-    file_data = await get_file_ids(StreamBot, int(DB_CHANNEL), int(id))
+    # Goes through the shared file ID cache, stream workers do not run StreamBot.
+    file_data = await get_byte_streamer(0).get_file_properties(int(id))
     if file_data.unique_id[:6] != secure_hash:
         logging.debug(f"link hash: {secure_hash} - {file_data.unique_id[:6]}")
         logging.debug(f"Invalid hash for message with - ID {id}")
@@ -28,12 +28,13 @@ async def render_page(id, secure_hash, src=None):
         template_file = "Zahid/template/req.html"
     else:
         template_file = "Zahid/template/dl.html"
-        async with aiohttp.ClientSession() as s:
-            async with s.get(src) as u:
-                file_size = humanbytes(int(u.headers.get("Content-Length")))
 
-    with open(template_file) as f:
-        template = jinja2.Template(f.read())
+    template = templates.get(template_file)
+    if template is None:
+        import jinja2
+
+        with open(template_file) as f:
+            template = templates[template_file] = jinja2.Template(f.read())
 
     file_name = file_data.file_name.replace("_", " ")
 
@@ -0,0 +1,90 @@
+import time
+import asyncio
+import logging
+from typing import Dict, List, Optional
+import aiohttp
+from config import SHORTENER_TIMEOUT, SHORTENER_CACHE_SIZE, SHORTENER_CACHE_TTL
+from .cache import LRUCache
+from .singleflight import SingleFlight
+
+# Consecutive failures of a shortener after which it is skipped for BREAKER_RESET seconds.
+BREAKER_THRESHOLD = 5
+BREAKER_RESET = 60
+
+
+class Shortener:
+    def __init__(self):
+        """Shortens links through the users' shortener sites without blocking the event loop.
+        attributes:
+            links: short links by (base_site, api_key, link), the api key is part of the key
+                so a link is never credited to another user's shortener account.
+            flights: in-flight shortener requests, the same link is only requested once.
+            breakers: [consecutive failures, open until] by base_site.
+
+        One aiohttp session with a pooled connector is kept for every shortener.
+        A site failing BREAKER_THRESHOLD times in a row is skipped for BREAKER_RESET
+        seconds, the original link is returned meanwhile.
+        """
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.links = LRUCache("short_links", SHORTENER_CACHE_SIZE, SHORTENER_CACHE_TTL)
+        self.flights = SingleFlight("shortener")
+        self.breakers: Dict[str, List[float]] = {}
+
+    def get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=SHORTENER_TIMEOUT),
+            )
+        return self.session
+
+    def is_open(self, base_site: str) -> bool:
+        breaker = self.breakers.get(base_site)
+        return breaker is not None and breaker[1] > time.monotonic()
+
+    def record(self, base_site: str, ok: bool) -> None:
+        if ok:
+            self.breakers.pop(base_site, None)
+            return
+        breaker = self.breakers.setdefault(base_site, [0, 0])
+        breaker[0] += 1
+        if breaker[0] >= BREAKER_THRESHOLD:
+            breaker[1] = time.monotonic() + BREAKER_RESET
+            logging.warning(f"Shortener {base_site} failed {breaker[0]} times in a row, skipping it for {BREAKER_RESET}s")
+
+    async def request(self, base_site: str, api_key: str, link: str) -> Optional[str]:
+        session = self.get_session()
+        if base_site == "api.shareus.io":
+            params = {"key": api_key, "link": link}
+            async with session.get(f"https://{base_site}/easy_api", params=params, raise_for_status=True, ssl=False) as response:
+                return await response.text()
+        params = {"api": api_key, "url": link}
+        async with session.get(f"https://{base_site}/api", params=params) as response:
+            data = await response.json(content_type=None)
+            if data["status"] == "success" or response.status == 200:
+                return data["shortenedUrl"]
+
+    async def shorten(self, base_site: str, api_key: str, link: str) -> str:
+        """Returns the short link, or the original link when the shortener is down or failing."""
+        key = (base_site, api_key, link)
+        short_link = self.links.get(key)
+        if short_link:
+            return short_link
+        if self.is_open(base_site):
+            return link
+
+        async def fetch():
+            try:
+                short_link = await self.request(base_site, api_key, link)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError, TypeError) as e:
+                logging.error(f"Shortener {base_site} failed: {e!r}")
+                short_link = None
+            self.record(base_site, bool(short_link))
+            if short_link:
+                self.links.set(key, short_link)
+            return short_link or link
+
+        return await self.flights.do(key, fetch)
+
+
+shortener = Shortener()
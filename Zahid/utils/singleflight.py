@@ -0,0 +1,37 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        """Deduplicates concurrent calls for the same key.
+        attributes:
+            name: the name used in the logs.
+            calls: the in-flight futures by key.
+            shared: the number of calls that joined an in-flight future instead of running.
+
+        The first caller for a key runs the coroutine, everyone arriving while it is in
+        flight awaits the same future. The future is shielded, so a waiter that gets
+        cancelled (e.g. a player closing the connection) does not abort it for the others.
+        """
+        self.name = name
+        self.calls: Dict[Hashable, asyncio.Future] = {}
+        self.shared = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        future = self.calls.get(key)
+        if future is not None:
+            self.shared += 1
+            logging.debug(f"Joined in-flight {self.name} call for {key}")
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(func())
+        self.calls[key] = future
+
+        def forget(done: asyncio.Future) -> None:
+            if self.calls.get(key) is done:
+                del self.calls[key]
+
+        future.add_done_callback(forget)
+        return await asyncio.shield(future)
@@ -0,0 +1,175 @@
+"""Memory allocated per GiB streamed by ByteStreamer.yield_file, before and after.
+
+For every range the peak traced memory above the starting point is taken, the
+sum is scaled to the bytes written.
+
+after drives the real yield_file, with plan_parts, the read-ahead window and the
+edge part slicing, over a ByteStreamer whose get_part returns preallocated parts.
+before runs the yield_file this repo shipped before, 1 MiB parts sliced as bytes
+with the part count computed by the route, over a media session whose GetFile
+returns the same preallocated parts. Only the work done by the stream path is
+measured and nothing talks to Telegram.
+The bytes yielded by after are checked against the length of every range, the
+ranges before served with a wrong length are counted.
+
+Needs the bot's environment, config is imported with the stream stack.
+
+Usage: python benchmarks/stream_alloc.py
+"""
+import os
+import sys
+import math
+import random
+import asyncio
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyrogram import raw
+from Zahid.bot import work_loads
+from Zahid.utils.custom_dl import ByteStreamer, MAX_CHUNK_SIZE
+
+GIB = 1024 * MAX_CHUNK_SIZE
+
+
+def make_streamer() -> ByteStreamer:
+    # Skips __init__, which starts the file ID refresh task.
+    streamer = ByteStreamer.__new__(ByteStreamer)
+    streamer.client = None
+    streamer.index = 0
+    parts = {}
+
+    async def get_location(file_id):
+        return None
+
+    async def generate_media_session(client, file_id):
+        return None
+
+    async def get_part(media_session, location, file_id, offset, chunk_size):
+        if chunk_size not in parts:
+            parts[chunk_size] = bytes(chunk_size)
+        return parts[chunk_size]
+
+    streamer.get_location = get_location
+    streamer.generate_media_session = generate_media_session
+    streamer.get_part = get_part
+    work_loads.setdefault(0, 0)
+    return streamer
+
+
+class PartSession:
+    """A media session answering every GetFile with a preallocated part."""
+
+    def __init__(self):
+        self.parts = {}
+
+    async def send(self, query):
+        if query.limit not in self.parts:
+            self.parts[query.limit] = raw.types.upload.File(
+                type=raw.types.storage.FileUnknown(), mtime=0, bytes=bytes(query.limit)
+            )
+        return self.parts[query.limit]
+
+
+async def baseline_yield_file(media_session, offset, first_part_cut, last_part_cut, part_count, chunk_size):
+    # ByteStreamer.yield_file as shipped before the memoryview change, minus logging and work loads.
+    current_part = 1
+    try:
+        r = await media_session.send(raw.functions.upload.GetFile(location=None, offset=offset, limit=chunk_size))
+        if isinstance(r, raw.types.upload.File):
+            while True:
+                chunk = r.bytes
+                if not chunk:
+                    break
+                elif part_count == 1:
+                    yield chunk[first_part_cut:last_part_cut]
+                elif current_part == 1:
+                    yield chunk[first_part_cut:]
+                elif current_part == part_count:
+                    yield chunk[:last_part_cut]
+                else:
+                    yield chunk
+
+                current_part += 1
+                offset += chunk_size
+
+                if current_part > part_count:
+                    break
+
+                r = await media_session.send(raw.functions.upload.GetFile(location=None, offset=offset, limit=chunk_size))
+    except (TimeoutError, AttributeError):
+        pass
+
+
+async def stream_before(media_session, ranges):
+    """Returns the bytes allocated, the bytes written and the ranges served with a wrong length."""
+    allocated = written = wrong = 0
+    for from_bytes, until_bytes in ranges:
+        # The range planning of media_streamer before plan_parts.
+        chunk_size = MAX_CHUNK_SIZE
+        offset = from_bytes - (from_bytes % chunk_size)
+        first_part_cut = from_bytes - offset
+        last_part_cut = until_bytes % chunk_size + 1
+        part_count = math.ceil(until_bytes / chunk_size) - math.floor(offset / chunk_size)
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        length = 0
+        async for chunk in baseline_yield_file(media_session, offset, first_part_cut, last_part_cut, part_count, chunk_size):
+            length += len(chunk)
+            del chunk
+        allocated += tracemalloc.get_traced_memory()[1] - before
+        wrong += length != until_bytes - from_bytes + 1
+        written += length
+    return allocated, written, wrong
+
+
+async def stream(streamer, ranges):
+    """Returns the bytes allocated and the bytes written while serving the ranges."""
+    file_id = SimpleNamespace(media_id=1, dc_id=1, message_id=1)
+    allocated = written = 0
+    for from_bytes, until_bytes in ranges:
+        chunk_size = streamer.choose_chunk_size(until_bytes - from_bytes + 1)
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        length = 0
+        async for chunk in streamer.yield_file(file_id, 0, from_bytes, until_bytes, chunk_size):
+            length += len(chunk)
+            del chunk
+        allocated += tracemalloc.get_traced_memory()[1] - before
+        assert length == until_bytes - from_bytes + 1, f"{from_bytes}-{until_bytes} yielded {length} bytes"
+        written += length
+    return allocated, written
+
+
+def scenarios():
+    rnd = random.Random(0)
+    yield "full download", [(0, GIB - 1)]
+    seeks = []
+    for _ in range(512):
+        start = rnd.randrange(0, GIB - 4 * MAX_CHUNK_SIZE)
+        seeks.append((start, start + 2 * MAX_CHUNK_SIZE - 1))
+    yield "2 MiB seeks", seeks
+    probes = []
+    for _ in range(8 * 1024):
+        start = rnd.randrange(0, GIB - MAX_CHUNK_SIZE)
+        probes.append((start, start + 16 * 1024 - 1))
+    yield "16 KiB probes", probes
+
+
+async def main():
+    streamer = make_streamer()
+    media_session = PartSession()
+    tracemalloc.start()
+    print(f"{'scenario':<16}{'before/GiB':>16}{'after/GiB':>16}{'wrong before':>14}")
+    for name, ranges in scenarios():
+        allocated, written, wrong = await stream_before(media_session, ranges)
+        before_per_gib = allocated * GIB / written
+        allocated, written = await stream(streamer, ranges)
+        after_per_gib = allocated * GIB / written
+        print(f"{name:<16}{before_per_gib / 1024:>12.1f} KiB{after_per_gib / 1024:>12.1f} KiB{wrong:>14}")
+    tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,7 +1,5 @@
-import sys
-import glob
 import importlib
-from pathlib import Path
+import importlib.util
 from pyrogram import idle
 import logging
 import logging.config
@@ -13,7 +11,7 @@ logging.getLogger("pyrogram").setLevel(logging.ERROR)
 
 from pyrogram import Client, __version__
 from pyrogram.raw.all import layer
-from config import LOG_CHANNEL, CLONE_MODE, PORT
+from config import LOG_CHANNEL, CLONE_MODE, PORT, STREAM_WORKERS
 from typing import Union, Optional, AsyncGenerator
 from pyrogram import types
 from Script import script 
@@ -21,48 +19,61 @@ from datetime import date, datetime
 import pytz
 from aiohttp import web
 from Zahid.server import web_server
+from Zahid.server.worker import run_workers
 
 import asyncio
 from pyrogram import idle
-from plugins.clone import restart_bots
 from Zahid.bot import StreamBot
 from Zahid.utils.keepalive import ping_server  # Your ping script imported here
 from Zahid.bot.clients import initialize_clients
-from plugins.ArticlesQuotes import schedule_daily_quotes, schedule_daily_articles
-from plugins.facts import schedule_facts
-from plugins.quiz import quiz_scheduler
-from plugins.vocabulary import schedule_vocabulary
-from plugins.wonders import *
-from plugins.affirmation import schedule_daily
+from plugins.database import Media, get_indexed_dc_ids
+from Zahid.bot.media_sessions import media_sessions
+from Zahid.utils.loop_lag import loop_lag
+from Zahid.utils.chunk_cache import chunk_cache
+from Zahid.bot.auto_delete import auto_delete
 
 
-ppath = "plugins/*.py"
-files = glob.glob(ppath)
+# Daily content schedulers, imported on start so a missing one does not stop the bot.
+SCHEDULERS = (
+    ("plugins.wonders", "schedule_wonders"),
+    ("plugins.affirmation", "schedule_daily"),
+)
+
 StreamBot.start()
 loop = asyncio.get_event_loop()
 
+
+def start_schedulers():
+    for module, name in SCHEDULERS:
+        if importlib.util.find_spec(module) is None:
+            logging.warning(f"Scheduler module {module} is not available, skipping it")
+            continue
+        try:
+            schedule = getattr(importlib.import_module(module), name)
+        except Exception:
+            # The module exists but is broken, e.g. one of its dependencies is missing.
+            logging.exception(f"Failed to load scheduler {module}.{name}")
+            continue
+        schedule(StreamBot)
+
 async def start():
     print('\n')
     print('Initializing Advanced Course File Share Bot...')
     bot_info = await StreamBot.get_me()
     StreamBot.username = bot_info.username
-    await initialize_clients()
-    
-    # Import plugins dynamically
-    for name in files:
-        with open(name) as a:
-            patt = Path(a.name)
-            plugin_name = patt.stem.replace(".py", "")
-            plugins_dir = Path(f"plugins/{plugin_name}.py")
-            import_path = "plugins.{}".format(plugin_name)
-            spec = importlib.util.spec_from_file_location(import_path, plugins_dir)
-            load = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(load)
-            sys.modules["plugins." + plugin_name] = load
-            print("Tactition Imported => " + plugin_name)
+    await Media.ensure_indexes()
+    if not STREAM_WORKERS:
+        await initialize_clients()
+        await asyncio.to_thread(chunk_cache.start)
+        asyncio.create_task(media_sessions.start(await get_indexed_dc_ids()))
+    # Plugins are loaded once by Pyrogram from the "plugins" root of StreamBot.
     
     # Start pinging server to keep the instance alive on all platforms!
     asyncio.create_task(ping_server())
+    asyncio.create_task(loop_lag.run())
+    # Auto deletions queued before a restart are carried out once their bot is registered.
+    auto_delete.register(StreamBot)
+    asyncio.create_task(auto_delete.run())
     
     me = await StreamBot.get_me()
     tz = pytz.timezone('Asia/Kolkata')
@@ -70,23 +81,22 @@ async def start():
     now = datetime.now(tz)
     time = now.strftime("%H:%M:%S %p")
     
-    app = web.AppRunner(await web_server())
     await StreamBot.send_message(chat_id=LOG_CHANNEL, text=script.RESTART_TXT.format(today, time))
-    await app.setup()
-    bind_address = "0.0.0.0"
-    await web.TCPSite(app, bind_address, PORT).start()
+    if STREAM_WORKERS:
+        # Streams are served by worker processes with their own share of MULTI_TOKEN
+        # clients, this process only handles updates and plugins.
+        asyncio.create_task(run_workers(STREAM_WORKERS))
+    else:
+        app = web.AppRunner(await web_server())
+        await app.setup()
+        bind_address = "0.0.0.0"
+        await web.TCPSite(app, bind_address, PORT).start()
     
 
-    # schedule_daily_quotes(StreamBot)  
-    # schedule_daily_articles(StreamBot)
-    # schedule_facts(StreamBot) 
-    # quiz_scheduler(StreamBot)
-    # schedule_vocabulary(StreamBot) 
-    schedule_wonders(StreamBot)
-    schedule_daily(StreamBot)
+    start_schedulers()
 
-    
     if CLONE_MODE == True:
+        from plugins.clone import restart_bots
         await restart_bots()
     
     print("Bot Started Powered By @Tactiton")
@@ -2,13 +2,13 @@
 import os
 import logging
 import random
-import asyncio
 from Script import script
 from validators import domain
 from clone_plugins.dbusers import clonedb
 from clone_plugins.users_api import get_user, update_user_info
 from pyrogram import Client, filters, enums
-from plugins.clone import mongo_db
+from Zahid.utils.mongo import get_clone_bot
+from Zahid.bot.auto_delete import auto_delete
 from pyrogram.errors import ChatAdminRequired, FloodWait
 from config import BOT_USERNAME, ADMINS
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Message, CallbackQuery, InputMediaPhoto
@@ -84,9 +84,7 @@ async def start(client, message):
                 return
         await msg.edit_caption(f_caption)
         k = await msg.reply(f"<b><u>❗️❗️❗️IMPORTANT❗️️❗️❗️</u></b>\n\nThis Movie File will be deleted in <b><u>{AUTO_DELETE} mins</u> 🫥 <i></b>(Due to Copyright Issues)</i>.\n\n<b><i>Please forward this File to your Saved Messages and Start Download there</i></b>",quote=True)
-        await asyncio.sleep(AUTO_DELETE_TIME)
-        await msg.delete()
-        await k.edit_text("<b>Your File is successfully deleted!!!</b>")
+        await auto_delete.schedule(client, message.from_user.id, [msg.id], AUTO_DELETE_TIME, k, "<b>Your File is successfully deleted!!!</b>")
         return
     except:
         pass
@@ -189,7 +187,7 @@ async def cb_handler(client: Client, query: CallbackQuery):
             query.message.id, 
             InputMediaPhoto(random.choice(PICS))
         )
-        owner = mongo_db.bots.find_one({'bot_id': me.id})
+        owner = await get_clone_bot(me.id)
         ownerid = int(owner['user_id'])
         reply_markup = InlineKeyboardMarkup(buttons)
         await query.message.edit_text(
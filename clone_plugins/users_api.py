@@ -1,47 +1,29 @@
-
-import requests
-import json
-from motor.motor_asyncio import AsyncIOMotorClient
-from config import CLONE_DB_URI, CDB_NAME
+from config import CLONE_DB_URI, CDB_NAME, USER_CACHE_SIZE, USER_CACHE_TTL
+from Zahid.utils.mongo import get_client, get_shortener_user, update_shortener_user
+from Zahid.utils.cache import LRUCache
+from Zahid.utils.shortener import shortener
 
    
 
-client = AsyncIOMotorClient(CLONE_DB_URI)
+client = get_client(CLONE_DB_URI)
 db = client[CDB_NAME]
 col = db["users"]
+# Shortener settings of clone bot users, written through on every update.
+user_settings = LRUCache("clone_user_settings", USER_CACHE_SIZE, USER_CACHE_TTL)
 
    
 
 async def get_short_link(user, link):
-    api_key = user["shortener_api"]
-    base_site = user["base_site"]
-    print(user)
-    response = requests.get(f"https://{base_site}/api?api={api_key}&url={link}")
-    data = response.json()
-    if data["status"] == "success" or response.status_code == 200:
-        return data["shortenedUrl"]
+    return await shortener.shorten(user["base_site"], user["shortener_api"], link)
 
    
 
 async def get_user(user_id):
-    user_id = int(user_id)
-    user = await col.find_one({"user_id": user_id})
-    if not user:
-        res = {
-            "user_id": user_id,
-            "shortener_api": None,
-            "base_site": None,
-        }
-        await col.insert_one(res)
-        user = await col.find_one({"user_id": user_id})
-    return user
+    return await get_shortener_user(int(user_id), col, user_settings)
 
    
 
 async def update_user_info(user_id, value:dict):
-    user_id = int(user_id)
-    myquery = {"user_id": user_id}
-    newvalues = { "$set": value }
-    await col.update_one(myquery, newvalues)
+    await update_shortener_user(int(user_id), value, col, user_settings)
 
    
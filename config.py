@@ -83,6 +83,34 @@ STREAM_MODE = bool(environ.get('STREAM_MODE', True)) # Set True or False
 MULTI_CLIENT = True
 SLEEP_THRESHOLD = int(environ.get('SLEEP_THRESHOLD', '00'))
 PING_INTERVAL = int(environ.get("PING_INTERVAL", "40")) # in Seconds 
+PREFETCH_PARTS = int(environ.get("PREFETCH_PARTS", "4")) # GetFile requests kept in flight per stream, 1 disables read-ahead
+STRIPE_CLIENTS = int(environ.get("STRIPE_CLIENTS", "1")) # MULTI_TOKEN clients sharing the parts of one download, 1 disables striping
+STRIPE_MIN_SIZE = int(environ.get("STRIPE_MIN_SIZE", str(64 * 1024 * 1024))) # Files smaller than this (in bytes) are never striped
+CHUNK_CACHE_DIR = environ.get("CHUNK_CACHE_DIR", "chunk_cache") # Directory for cached file parts
+CHUNK_CACHE_SIZE = int(environ.get("CHUNK_CACHE_SIZE", "0")) # Max disk usage of the part cache in bytes, 0 disables it
+FILE_ID_CACHE_SIZE = int(environ.get("FILE_ID_CACHE_SIZE", "1000")) # Max number of cached file IDs
+FILE_ID_CACHE_TTL = int(environ.get("FILE_ID_CACHE_TTL", "1800")) # in Seconds
+FILE_ID_CACHE_REFRESH = int(environ.get("FILE_ID_CACHE_REFRESH", "300")) # Refresh file IDs in use this many seconds before they expire
+MEDIA_SESSIONS_PER_DC = int(environ.get("MEDIA_SESSIONS_PER_DC", "1")) # Media sessions kept per client and DC
+MEDIA_SESSION_PING_INTERVAL = int(environ.get("MEDIA_SESSION_PING_INTERVAL", "60")) # in Seconds
+MONGO_MAX_POOL_SIZE = int(environ.get("MONGO_MAX_POOL_SIZE", "50")) # Connections per Mongo cluster shared by every database of the process
+MONGO_MIN_POOL_SIZE = int(environ.get("MONGO_MIN_POOL_SIZE", "2")) # Connections kept open while idle
+MONGO_MAX_IDLE_TIME = int(environ.get("MONGO_MAX_IDLE_TIME", "300")) # in Seconds, idle connections above the minimum are closed after it
+MONGO_COMPRESSORS = environ.get("MONGO_COMPRESSORS", "zlib") # Wire compression (zlib, snappy, zstd), empty disables it
+USER_CACHE_SIZE = int(environ.get("USER_CACHE_SIZE", "10000")) # Max number of cached user shortener settings
+USER_CACHE_TTL = int(environ.get("USER_CACHE_TTL", "600")) # in Seconds
+SHORTENER_TIMEOUT = int(environ.get("SHORTENER_TIMEOUT", "10")) # in Seconds, the original link is sent when a shortener is slower
+SHORTENER_CACHE_SIZE = int(environ.get("SHORTENER_CACHE_SIZE", "10000")) # Max number of cached short links
+SHORTENER_CACHE_TTL = int(environ.get("SHORTENER_CACHE_TTL", "86400")) # in Seconds
+BROADCAST_RATE = int(environ.get("BROADCAST_RATE", "25")) # Broadcast messages per second per bot, Telegram allows about 30
+BROADCAST_WORKERS = int(environ.get("BROADCAST_WORKERS", "50")) # Concurrent broadcast sends
+BROADCAST_HELPERS = is_enabled(environ.get("BROADCAST_HELPERS", "False"), False) # Spread broadcasts over the MULTI_TOKEN bots, users must have started them
+MANIFEST_CACHE_SIZE = int(environ.get("MANIFEST_CACHE_SIZE", "1000")) # Max number of cached batch manifests
+MANIFEST_CACHE_TTL = int(environ.get("MANIFEST_CACHE_TTL", "3600")) # in Seconds
+BATCH_SEND_RATE = float(environ.get("BATCH_SEND_RATE", "1")) # Batch files sent per second to one chat, Telegram allows about 1, so file by file a batch takes about a second per file, see BATCH_GROUPED
+BATCH_SEND_BURST = int(environ.get("BATCH_SEND_BURST", "3")) # Batch files sent to one chat without pacing
+BATCH_GROUPED = is_enabled(environ.get("BATCH_GROUPED", "False"), False) # Copy batch files whose caption already carries BATCH_FILE_CAPTION 100 at a time, stream buttons are sent together
+STREAM_WORKERS = int(environ.get("STREAM_WORKERS", "0")) # Stream-only worker processes sharing PORT, 0 serves streams from the bot process
 if 'DYNO' in environ:
     ON_HEROKU = True
 else:
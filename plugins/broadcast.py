@@ -1,33 +1,19 @@
-   
-
-from pyrogram.errors import InputUserDeactivated, UserNotParticipant, FloodWait, UserIsBlocked, PeerIdInvalid
 from plugins.dbusers import db
 from pyrogram import Client, filters
-from config import ADMINS
-import asyncio
+from config import ADMINS, DB_CHANNEL, BROADCAST_HELPERS
+from Zahid.bot import multi_clients
+from Zahid.bot.broadcast import Broadcast
 import datetime
 import time
 
-   
 
-async def broadcast_messages(user_id, message):
-    try:
-        await message.copy(chat_id=user_id)
-        return True, "Success"
-    except FloodWait as e:
-        await asyncio.sleep(e.value)
-        return await broadcast_messages(user_id, message)
-    except InputUserDeactivated:
-        await db.delete_user(int(user_id))
-        return False, "Deleted"
-    except UserIsBlocked:
-        await db.delete_user(int(user_id))
-        return False, "Blocked"
-    except PeerIdInvalid:
-        await db.delete_user(int(user_id))
-        return False, "Error"
-    except Exception as e:
-        return False, "Error"
+async def delete_user(user_id):
+    await db.delete_user(int(user_id))
+
+
+async def user_ids(users):
+    async for user in users:
+        yield int(user['id']) if 'id' in user else None
 
 
 # Broadcast command handler
@@ -47,52 +33,39 @@ async def verupikkals(bot, message):
     start_time = time.time()
     total_users = await db.total_users_count()
 
-    done = 0
-    blocked = 0
-    deleted = 0
-    failed = 0
-    success = 0
-
-   
-
-    async for user in users:
-        if 'id' in user:
-            pti, sh = await broadcast_messages(int(user['id']), b_msg)
-            if pti:
-                success += 1
-            else:
-                if sh == "Blocked":
-                    blocked += 1
-                elif sh == "Deleted":
-                    deleted += 1
-                elif sh == "Error":
-                    failed += 1
-        else:
-            failed += 1  # No user ID, can't send
+    clients = [bot]
+    if BROADCAST_HELPERS:
+        clients += [client for index, client in multi_clients.items() if index != 0]
+    if len(clients) > 1:
+        # Helper bots can't see the admin's chat, they copy the message from DB_CHANNEL.
+        post = await b_msg.copy(DB_CHANNEL)
+        broadcast = Broadcast(clients, DB_CHANNEL, post.id, delete_user)
+    else:
+        broadcast = Broadcast(clients, b_msg.chat.id, b_msg.id, delete_user)
 
-        done += 1
+    async def progress(broadcast):
+        try:
+            await sts.edit(
+                f"🚀 Broadcast in progress...\n\n"
+                f"👥 Total Users: {total_users}\n"
+                f"✅ Success: {broadcast.success}\n"
+                f"⛔ Blocked: {broadcast.blocked}\n"
+                f"🗑️ Deleted: {broadcast.deleted}\n"
+                f"❌ Failed: {broadcast.failed}\n"
+                f"📦 Completed: {broadcast.done}/{total_users}"
+            )
+        except:
+            pass
 
-        if done % 20 == 0:
-            try:
-                await sts.edit(
-                    f"🚀 Broadcast in progress...\n\n"
-                    f"👥 Total Users: {total_users}\n"
-                    f"✅ Success: {success}\n"
-                    f"⛔ Blocked: {blocked}\n"
-                    f"🗑️ Deleted: {deleted}\n"
-                    f"❌ Failed: {failed}\n"
-                    f"📦 Completed: {done}/{total_users}"
-                )
-            except:
-                pass
+    await broadcast.run(user_ids(users), progress)
 
     time_taken = datetime.timedelta(seconds=int(time.time() - start_time))
     await sts.edit(
         f"✅ **Broadcast Completed!**\n\n"
         f"🕒 Time Taken: {time_taken}\n"
         f"👥 Total Users: {total_users}\n"
-        f"✅ Success: {success}\n"
-        f"⛔ Blocked: {blocked}\n"
-        f"🗑️ Deleted: {deleted}\n"
-        f"❌ Failed: {failed}"
+        f"✅ Success: {broadcast.success}\n"
+        f"⛔ Blocked: {broadcast.blocked}\n"
+        f"🗑️ Deleted: {broadcast.deleted}\n"
+        f"❌ Failed: {broadcast.failed}"
     )
@@ -1,15 +1,12 @@
 import re
 import logging
-from pymongo import MongoClient
 from Script import script
 from pyrogram import Client, filters
 from pyrogram.types import Message
 from pyrogram.errors.exceptions.bad_request_400 import AccessTokenExpired, AccessTokenInvalid
-from config import API_ID, API_HASH, DB_URI,CLONE_MODE, DB_NAME, CDB_NAME, CLONE_DB_URI
-
-mongo_client = MongoClient(DB_URI)
-mongo_db = mongo_client["cloned-bots"]
-# all the data of clone bots will be stored in this database name and it will contain token and name 
+from config import API_ID, API_HASH, CLONE_MODE, DB_NAME, CDB_NAME, CLONE_DB_URI
+from Zahid.utils.mongo import add_clone_bot, get_clone_bot_by_token, delete_clone_bot, get_clone_bots
+from Zahid.bot.auto_delete import auto_delete
 
 @Client.on_message(filters.command("clone") & filters.private)
 async def clone(client, message):
@@ -35,6 +32,7 @@ async def clone(client, message):
             plugins={"root": "clone_plugins"}
         )
         await vj.start()
+        auto_delete.register(vj)
         bot = await vj.get_me()
         details = {
             'bot_id': bot.id,
@@ -44,7 +42,7 @@ async def clone(client, message):
             'token': bot_token,
             'username': bot.username
         }
-        mongo_db.bots.insert_one(details)
+        await add_clone_bot(details)
         await msg.edit_text(f"<b>sᴜᴄᴄᴇssғᴜʟʟʏ ᴄʟᴏɴᴇᴅ ʏᴏᴜʀ ʙᴏᴛ: @{bot.username}.</b>")
     except BaseException as e:
         await msg.edit_text(f"⚠️ <b>Bot Error:</b>\n\n<code>{e}</code>\n\n**Kindly forward this message to @tactition to get assistance.**")
@@ -58,9 +56,9 @@ async def delete_cloned_bot(client, message):
         bot_token = re.findall(r'\d[0-9]{8,10}:[0-9A-Za-z_-]{35}', Zahid.text, re.IGNORECASE)
         bot_token = bot_token[0] if bot_token else None
         bot_id = re.findall(r'\d[0-9]{8,10}', Zahid.text)
-        cloned_bot = mongo_db.bots.find_one({"token": bot_token})
+        cloned_bot = await get_clone_bot_by_token(bot_token)
         if cloned_bot:
-            mongo_db.bots.delete_one({"token": bot_token})
+            await delete_clone_bot(bot_token)
             await message.reply_text("**🤖 ᴛʜᴇ ᴄʟᴏɴᴇᴅ ʙᴏᴛ ʜᴀs ʙᴇᴇɴ ʀᴇᴍᴏᴠᴇᴅ ғʀᴏᴍ ᴛʜᴇ ʟɪsᴛ ᴀɴᴅ ɪᴛs ᴅᴇᴛᴀɪʟs ʜᴀᴠᴇ ʙᴇᴇɴ ʀᴇᴍᴏᴠᴇᴅ ғʀᴏᴍ ᴛʜᴇ ᴅᴀᴛᴀʙᴀsᴇ. ☠️**")
         else:
             await message.reply_text("**⚠️ ᴛʜᴇ ʙᴏᴛ ᴛᴏᴋᴇɴ ᴘʀᴏᴠɪᴅᴇᴅ ɪs ɴᴏᴛ ɪɴ ᴛʜᴇ ᴄʟᴏɴᴇᴅ ʟɪsᴛ.**")
@@ -71,8 +69,7 @@ async def delete_cloned_bot(client, message):
 
 async def restart_bots():
     logging.info("Restarting all bots........")
-    bots = list(mongo_db.bots.find())
-    for bot in bots:
+    async for bot in get_clone_bots():
         bot_token = bot['token']
         try:
             vj = Client(
@@ -81,5 +78,6 @@ async def restart_bots():
                 plugins={"root": "clone_plugins"},
             )
             await vj.start()
+            auto_delete.register(vj)
         except Exception as e:
             logging.exception(f"Error while restarting bot with token {bot_token}: {e}")
\ No newline at end of file
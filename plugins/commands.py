@@ -1,7 +1,5 @@
-import os
 import logging
 import random
-import asyncio
 from validators import domain
 from Script import script
 from plugins.dbusers import db
@@ -12,10 +10,13 @@ from pyrogram.types import *
 from utils import verify_user, check_token, check_verification, get_token
 from config import *
 import re
-import json
 import base64
 from urllib.parse import quote_plus
+from itertools import groupby
 from Zahid.utils.file_properties import get_name, get_hash, get_media_file_size
+from Zahid.utils.manifest import manifests
+from Zahid.bot.batch import fetch_pages, fetch_messages, send_paced, copy_grouped, stream_entry, stream_keyboards
+from Zahid.bot.auto_delete import auto_delete
 
 from pytz import timezone  # Import pytz to handle India Time (Asia/Kolkata)
 from datetime import date, datetime, timedelta
@@ -29,8 +30,6 @@ import urllib.parse
 import requests
 logger = logging.getLogger(__name__)
 
-BATCH_FILES = {}
-
 # Added force sub  
 async def is_subscribed(bot, query, channel):
     btn = []
@@ -63,6 +62,68 @@ def formate_file_name(file_name):
     return truncated + ""
 #➡️in abve return you can set the custom sting to attach with file name
 
+def batch_captions(info):
+    """Returns the original caption of a batch file and the one generated from BATCH_FILE_CAPTION."""
+    orig_caption = ""
+    if info.caption:
+        try:
+            orig_caption = info.caption.html
+        except:
+            orig_caption = info.caption
+    file = getattr(info, info.media.value)
+    title = formate_file_name(getattr(file, "file_name", ""))
+    size = get_size(int(file.file_size))
+    generated_caption = f"<code>{title}</code>"
+    if BATCH_FILE_CAPTION:
+        try:
+            generated_caption = BATCH_FILE_CAPTION.format(file_name=title or "", file_size=size or "", file_caption="")
+        except:
+            pass
+    if not generated_caption:
+        generated_caption = f"{title}"
+    return orig_caption, generated_caption
+
+
+def keeps_caption(info):
+    """True when a batch file is sent as is: it has no media or its caption already carries the generated one."""
+    if not info.media:
+        return True
+    orig_caption, generated_caption = batch_captions(info)
+    return bool(orig_caption) and generated_caption in orig_caption
+
+
+async def send_batch_file(client, chat_id, info):
+    """Copies one batch file with the generated caption and its stream buttons, returns the sent message ID."""
+    if info.media:
+        orig_caption, generated_caption = batch_captions(info)
+        # Combine original and generated captions.
+        new_caption = f"{orig_caption}\n\n{generated_caption}" if orig_caption else generated_caption
+        # Extended condition: include audio files along with video and documents.
+        if STREAM_MODE == True and (info.video or info.document or info.audio):
+            log_msg = info
+            stream = f"{URL}watch/{str(log_msg.id)}/{quote_plus(get_name(log_msg) or '')}?hash={get_hash(log_msg)}"
+            download = f"{URL}{str(log_msg.id)}/{quote_plus(get_name(log_msg) or '')}?hash={get_hash(log_msg)}"
+            button = [[
+                InlineKeyboardButton("• ᴅᴏᴡɴʟᴏᴀᴅ •", url=download),
+                InlineKeyboardButton("• ᴡᴀᴛᴄʜ •", url=stream)
+            ],[
+                InlineKeyboardButton("• ᴡᴀᴛᴄʜ ɪɴ ᴡᴇʙ ᴀᴘᴘ •", web_app=WebAppInfo(url=stream))
+            ]]
+            reply_markup = InlineKeyboardMarkup(button)
+        else:
+            reply_markup = None
+        try:
+            msg_copy = await send_paced(chat_id, lambda: info.copy(chat_id=chat_id, caption=new_caption, protect_content=False, reply_markup=reply_markup))
+        except:
+            return None
+    else:
+        try:
+            msg_copy = await send_paced(chat_id, lambda: info.copy(chat_id=chat_id, protect_content=False))
+        except:
+            return None
+    return msg_copy.id
+
+
 @Client.on_message(filters.command("start") & filters.incoming)
 async def start(client, message):
     # Check subscription if AUTH_CHANNEL is defined.
@@ -153,97 +214,49 @@ async def start(client, message):
             return await message.reply_text(f"**Error - {e}**")
         sts = await message.reply("**🔺 ᴘʟᴇᴀsᴇ ᴡᴀɪᴛ**")
         file_id = data.split("-", 1)[1]
-        msgs = BATCH_FILES.get(file_id)
+        decode_file_id = base64.urlsafe_b64decode(file_id + "=" * (-len(file_id) % 4)).decode("ascii")
+        # The manifest is cached by batch ID, stored in Mongo and migrated from DB_CHANNEL for old links.
+        msgs = await manifests.get(client, int(decode_file_id))
         if not msgs:
-            decode_file_id = base64.urlsafe_b64decode(file_id + "=" * (-len(file_id) % 4)).decode("ascii")
-            # Retrieve batch file from permanent storage (DB_CHANNEL)
-            msg = await client.get_messages(DB_CHANNEL, int(decode_file_id))
-            media = getattr(msg, msg.media.value)
-            file_id = media.file_id
-            file = await client.download_media(file_id)
-            try: 
-                with open(file) as file_data:
-                    msgs = json.loads(file_data.read())
-            except:
-                await sts.edit("FAILED")
-                return await client.send_message(LOG_CHANNEL, "UNABLE TO OPEN FILE.")
-            os.remove(file)
-            BATCH_FILES[file_id] = msgs
-            
+            await sts.edit("FAILED")
+            return await client.send_message(LOG_CHANNEL, "UNABLE TO OPEN FILE.")
+
         filesarr = []
-        for msg in msgs:
-            channel_id = int(msg.get("channel_id"))
-            msgid = msg.get("msg_id")
-            info = await client.get_messages(channel_id, int(msgid))
-            if info.media:
-                # Capture the original caption if any.
-                orig_caption = ""
-                if info.caption:
-                    try:
-                        orig_caption = info.caption.html
-                    except:
-                        orig_caption = info.caption
-                file_type = info.media
-                file = getattr(info, file_type.value)
-                old_title = getattr(file, "file_name", "")
-                title = formate_file_name(old_title)
-                size = get_size(int(file.file_size))
-                # Generate the caption as per existing logic.
-                generated_caption = f"<code>{title}</code>"
-                if BATCH_FILE_CAPTION:
-                    try:
-                        generated_caption = BATCH_FILE_CAPTION.format(file_name=title or "", file_size=size or "", file_caption="")
-                    except:
-                        pass
-                if not generated_caption:
-                    generated_caption = f"{title}"
-                # Combine original and generated captions.
-                new_caption = f"{orig_caption}\n\n{generated_caption}" if orig_caption else generated_caption
-                # Extended condition: include audio files along with video and documents.
-                if STREAM_MODE == True and (info.video or info.document or info.audio):
-                    log_msg = info
-                    fileName = quote_plus(get_name(log_msg))
-                    stream = f"{URL}watch/{str(log_msg.id)}/{quote_plus(get_name(log_msg))}?hash={get_hash(log_msg)}"
-                    download = f"{URL}{str(log_msg.id)}/{quote_plus(get_name(log_msg))}?hash={get_hash(log_msg)}"
-                    button = [[
-                        InlineKeyboardButton("• ᴅᴏᴡɴʟᴏᴀᴅ •", url=download),
-                        InlineKeyboardButton("• ᴡᴀᴛᴄʜ •", url=stream)
-                    ],[
-                        InlineKeyboardButton("• ᴡᴀᴛᴄʜ ɪɴ ᴡᴇʙ ᴀᴘᴘ •", web_app=WebAppInfo(url=stream))
-                    ]]
-                    reply_markup = InlineKeyboardMarkup(button)
-                else:
-                    reply_markup = None
-                try:
-                    msg_copy = await info.copy(chat_id=message.from_user.id, caption=new_caption, protect_content=False, reply_markup=reply_markup)
-                except FloodWait as e:
-                    await asyncio.sleep(e.value)
-                    msg_copy = await info.copy(chat_id=message.from_user.id, caption=new_caption, protect_content=False, reply_markup=reply_markup)
-                except:
-                    continue
-            else:
-                try:
-                    msg_copy = await info.copy(chat_id=message.from_user.id, protect_content=False)
-                except FloodWait as e:
-                    await asyncio.sleep(e.value)
-                    msg_copy = await info.copy(chat_id=message.from_user.id, protect_content=False)
-                except:
-                    continue
-            filesarr.append(msg_copy)
-            await asyncio.sleep(1)
+        if BATCH_GROUPED:
+            # Files whose own caption already carries BATCH_FILE_CAPTION are copied 100 at a time,
+            # the rest are sent one by one with their caption rewritten.
+            entries = []
+            try:
+                async for messages in fetch_pages(client, msgs):
+                    for grouped, group in groupby(messages, key=keeps_caption):
+                        group = list(group)
+                        if not grouped:
+                            for info in group:
+                                sent = await send_batch_file(client, message.from_user.id, info)
+                                if sent:
+                                    filesarr.append(sent)
+                            continue
+                        await copy_grouped(client, message.from_user.id, group, filesarr)
+                        if STREAM_MODE == True:
+                            entries += [stream_entry(info) for info in group if info.video or info.document or info.audio]
+                for reply_markup in stream_keyboards(entries):
+                    k = await send_paced(message.from_user.id, lambda: client.send_message(message.from_user.id, "<b>• ᴅᴏᴡɴʟᴏᴀᴅ / ᴡᴀᴛᴄʜ •</b>", reply_markup=reply_markup))
+                    filesarr.append(k.id)
+            except Exception:
+                # Whatever was delivered is still queued for auto delete below.
+                logger.exception("Grouped batch delivery failed")
+        else:
+            async for info in fetch_messages(client, msgs):
+                sent = await send_batch_file(client, message.from_user.id, info)
+                if sent:
+                    filesarr.append(sent)
         await sts.delete()
         if AUTO_DELETE_MODE == True:
             k = await client.send_message(
                 chat_id=message.from_user.id, 
                 text=f"<b><u>❗️❗️❗️IMPORTANT❗️️❗️❗️</u></b>\n\nThis File will be deleted in <b><u>{AUTO_DELETE} minutes</u> 🫥 <i></b>(Due to Copyright Reason)</i>.\n\n<b><i>Please forward this File to your Saved Messages and Start Download there</b>"
             )
-            await asyncio.sleep(AUTO_DELETE_TIME)
-            for x in filesarr:
-                try:
-                    await x.delete()
-                except:
-                    pass
-            await k.edit_text("<b>Your All Files/Videos is successfully deleted!!!</b>")
+            await auto_delete.schedule(client, message.from_user.id, filesarr, AUTO_DELETE_TIME, k, "<b>Your All Files/Videos is successfully deleted!!!</b>")
         return
 
     # For single file links
@@ -323,12 +336,7 @@ async def start(client, message):
                 chat_id=message.from_user.id, 
                 text=f"<b><u>❗️❗️❗️IMPORTANT❗️️❗️❗️</u></b>\n\nThis File will be deleted in <b><u>{AUTO_DELETE} minutes</u> 🫥 <i></b>(Due to Copyright Issues)</i>.\n\n<b><i>Please forward this File to your Saved Messages and Start Download there</b>"
             )
-            await asyncio.sleep(AUTO_DELETE_TIME)
-            try:
-                await del_msg.delete()
-            except:
-                pass
-            await k.edit_text("<b>Your File is successfully deleted!!!</b>")
+            await auto_delete.schedule(client, message.from_user.id, [del_msg.id], AUTO_DELETE_TIME, k, "<b>Your File is successfully deleted!!!</b>")
         return
     except Exception as e:
         return await message.reply_text("Error processing your file or No file found In Database Or File Deleted From Database.")
@@ -2,13 +2,14 @@
 
 import logging
 from struct import pack
+from datetime import timezone
 import re
 import base64
 from pyrogram.file_id import FileId
 from pymongo.errors import DuplicateKeyError
 from umongo import Instance, Document, fields
-from motor.motor_asyncio import AsyncIOMotorClient
 from config import DB_URI, DB_NAME
+from Zahid.utils.mongo import get_client
 
 
 logger = logging.getLogger(__name__)
@@ -16,30 +17,120 @@ logger.setLevel(logging.INFO)
 
 
 COLLECTION_NAME = "Telegram_Files"
+MANIFEST_COLLECTION_NAME = "Batch_Manifests"
+AUTO_DELETE_COLLECTION_NAME = "Auto_Deletes"
 
 
 
-client = AsyncIOMotorClient(DB_URI)
+client = get_client(DB_URI)
 db = client[DB_NAME]
 instance = Instance.from_db(db)
 
 
 @instance.register
 class Media(Document):
-    file_id = fields.StrField(attribute='_id')
+    msg_id = fields.IntField(attribute='_id')
+    file_id = fields.StrField(required=True)
     file_ref = fields.StrField(allow_none=True)
+    file_unique_id = fields.StrField(required=True)
     file_name = fields.StrField(required=True)
     file_size = fields.IntField(required=True)
     file_type = fields.StrField(allow_none=True)
     mime_type = fields.StrField(allow_none=True)
+    dc_id = fields.IntField(required=True)
     caption = fields.StrField(allow_none=True)
+    date = fields.DateTimeField(allow_none=True)
 
     class Meta:
-        indexes = ('$file_name', )
+        indexes = ('$file_name', 'file_unique_id', 'dc_id')
         collection_name = COLLECTION_NAME
 
 
 
+async def save_file(msg_id, file_id, file_unique_id, file_name, file_size, mime_type, caption=None, date=None):
+    """Index a file stored in DB_CHANNEL, replacing the entry of the same message if any"""
+    decoded = FileId.decode(file_id)
+    _, file_ref = unpack_new_file_id(file_id)
+    file = Media(
+        msg_id=msg_id,
+        file_id=file_id,
+        file_ref=file_ref,
+        file_unique_id=file_unique_id,
+        file_name=file_name or "",
+        file_size=file_size or 0,
+        file_type=decoded.file_type.name.lower(),
+        mime_type=mime_type,
+        dc_id=decoded.dc_id,
+        caption=caption,
+        date=date.astimezone(timezone.utc) if date else None,
+    )
+    await Media.collection.replace_one({'_id': msg_id}, file.to_mongo(), upsert=True)
+    logger.debug(f"Indexed message {msg_id} - {file_name}")
+
+
+
+async def get_stream_file(msg_id):
+    return await Media.find_one({'msg_id': int(msg_id)})
+
+
+
+async def get_indexed_dc_ids():
+    return await Media.collection.distinct('dc_id')
+
+
+
+async def save_manifest(batch_id, runs, count):
+    """Store the encoded manifest of a BATCH link, keyed by the batch ID of the link"""
+    await db[MANIFEST_COLLECTION_NAME].replace_one(
+        {'_id': batch_id}, {'_id': batch_id, 'runs': runs, 'count': count}, upsert=True
+    )
+
+
+
+async def get_manifest(batch_id):
+    manifest = await db[MANIFEST_COLLECTION_NAME].find_one({'_id': batch_id})
+    return bytes(manifest['runs']) if manifest else None
+
+
+
+async def ensure_auto_delete_index(expire_after):
+    """Index the due time of auto deletions, entries still queued expire_after seconds past it are dropped"""
+    await db[AUTO_DELETE_COLLECTION_NAME].create_index('due', expireAfterSeconds=expire_after)
+
+
+
+async def add_auto_delete(entry):
+    await db[AUTO_DELETE_COLLECTION_NAME].insert_one(entry)
+
+
+
+async def get_due_auto_deletes(bot_ids, until, limit):
+    cursor = db[AUTO_DELETE_COLLECTION_NAME].find(
+        {'bot_id': {'$in': bot_ids}, 'due': {'$lte': until}}
+    ).sort('due', 1)
+    return await cursor.to_list(length=limit)
+
+
+
+async def get_next_auto_delete(bot_ids):
+    """Return the due time of the next auto deletion of the given bots, None when nothing is queued"""
+    entry = await db[AUTO_DELETE_COLLECTION_NAME].find_one(
+        {'bot_id': {'$in': bot_ids}}, {'due': 1}, sort=[('due', 1)]
+    )
+    return entry['due'] if entry else None
+
+
+
+async def postpone_auto_delete(entry_id, due):
+    await db[AUTO_DELETE_COLLECTION_NAME].update_one({'_id': entry_id}, {'$set': {'due': due}})
+
+
+
+async def remove_auto_delete(entry_id):
+    await db[AUTO_DELETE_COLLECTION_NAME].delete_one({'_id': entry_id})
+
+
+
 async def get_file_details(query):
     filter = {'file_id': query}
     cursor = Media.find(filter)
@@ -1,10 +1,10 @@
-import motor.motor_asyncio
 from config import DB_NAME, DB_URI
+from Zahid.utils.mongo import get_client
 
 class Database:
     
     def __init__(self, uri, database_name):
-        self._client = motor.motor_asyncio.AsyncIOMotorClient(uri)
+        self._client = get_client(uri)
         self.db = self._client[database_name]
         self.col = self.db.users
 
@@ -3,10 +3,15 @@ from pyrogram import filters, Client, enums
 from pyrogram.errors.exceptions.bad_request_400 import ChannelInvalid, UsernameInvalid, UsernameNotModified
 from config import ADMINS, LOG_CHANNEL, DB_CHANNEL, PUBLIC_FILE_STORE, WEBSITE_URL, WEBSITE_URL_MODE
 from plugins.users_api import get_user, get_short_link
-import os
-import json
+from Zahid.utils.file_properties import index_message
+from Zahid.utils.manifest import manifests, ManifestBuilder
+from Zahid.bot.batch import scan_range
+import time
 import base64
 
+# Seconds between two progress edits of /batch.
+PROGRESS_INTERVAL = 3
+
  
 async def allowed(_, __, message):
     if PUBLIC_FILE_STORE:
@@ -22,6 +27,7 @@ async def incoming_gen_link(bot, message):
     username = (await bot.get_me()).username
     # Copy the message/file to your dedicated DB channel for permanent storage.
     post = await message.copy(DB_CHANNEL)
+    await index_message(post)
     file_id = str(post.id)
     string = 'file_' + file_id
     outstr = base64.urlsafe_b64encode(string.encode("ascii")).decode().strip("=")
@@ -49,6 +55,7 @@ async def gen_link_s(bot, message):
      
     # Copy the replied message to the dedicated DB channel.
     post = await replied.copy(DB_CHANNEL)
+    await index_message(post)
     file_id = str(post.id)
     string = f"file_{file_id}"
     outstr = base64.urlsafe_b64encode(string.encode("ascii")).decode().strip("=")
@@ -110,30 +117,27 @@ async def gen_link_batch(bot, message):
 
     FRMT = "**ɢᴇɴᴇʀᴀᴛɪɴɢ ʟɪɴᴋ...**\n**ᴛᴏᴛᴀʟ ᴍᴇssᴀɢᴇs:** {total}\n**ᴅᴏɴᴇ:** {current}\n**ʀᴇᴍᴀɪɴɪɴɢ:** {rem}\n**sᴛᴀᴛᴜs:** {sts}"
 
-    outlist = []
-    og_msg = 0
+    total = l_msg_id - f_msg_id + 1
+    builder = ManifestBuilder()
     tot = 0
-    async for msg in bot.iter_messages(f_chat_id, l_msg_id, f_msg_id):
-        tot += 1
-        if og_msg % 20 == 0:
+    last_edit = time.monotonic()
+    async for messages in scan_range(bot, f_chat_id, f_msg_id, l_msg_id):
+        for msg in messages:
+            tot += 1
+            if not msg or msg.empty or msg.service:
+                continue
+            builder.add(f_chat_id, msg.id)
+        if time.monotonic() - last_edit >= PROGRESS_INTERVAL:
+            last_edit = time.monotonic()
             try:
-                await sts.edit(FRMT.format(total=l_msg_id - f_msg_id, current=tot, rem=(l_msg_id - f_msg_id) - tot, sts="Saving Messages"))
+                await sts.edit(FRMT.format(total=total, current=tot, rem=total - tot, sts="Saving Messages"))
             except:
                 pass
-        if msg.empty or msg.service:
-            continue
-        file = {
-            "channel_id": f_chat_id,
-            "msg_id": msg.id
-        }
-        og_msg += 1
-        outlist.append(file)
+    og_msg = builder.count
 
-    with open(f"batchmode_{message.from_user.id}.json", "w+") as out:
-        json.dump(outlist, out)
-    # Send the batch file to your dedicated DB channel for permanent storage.
-    post = await bot.send_document(DB_CHANNEL, f"batchmode_{message.from_user.id}.json", file_name="Batch.json", caption="⚠️ Batch Generated For Filestore.")
-    os.remove(f"batchmode_{message.from_user.id}.json")
+    # The manifest is stored in Mongo, the DB_CHANNEL message only reserves the batch ID of the link.
+    post = await bot.send_message(DB_CHANNEL, f"⚠️ Batch Generated For Filestore.\n{og_msg} files from {f_chat_id}: {f_msg_id}-{l_msg_id}")
+    await manifests.save_builder(post.id, builder)
     string = str(post.id)
     file_id = base64.urlsafe_b64encode(string.encode("ascii")).decode().strip("=")
     user_id = message.from_user.id
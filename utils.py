@@ -1,7 +1,7 @@
-import logging, asyncio, os, re, random, pytz, aiohttp, requests, string, json, http.client
+import logging, asyncio, os, re, random, pytz, requests, string, json, http.client
 from datetime import date, datetime
 from config import SHORTLINK_API, SHORTLINK_URL
-from shortzy import Shortzy
+from Zahid.utils.shortener import shortener
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -9,28 +9,7 @@ TOKENS = {}
 VERIFIED = {}
 
 async def get_verify_shorted_link(link):
-    if SHORTLINK_URL == "api.shareus.io":
-        url = f'https://{SHORTLINK_URL}/easy_api'
-        params = {
-            "key": SHORTLINK_API,
-            "link": link,
-        }
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params, raise_for_status=True, ssl=False) as response:
-                    data = await response.text()
-                    return data
-        except Exception as e:
-            logger.error(e)
-            return link
-    else:
-  #      response = requests.get(f"https://{SHORTLINK_URL}/api?api={SHORTLINK_API}&url={link}")
- #       data = response.json()
-  #      if data["status"] == "success" or rget.status_code == 200:
-   #         return data["shortenedUrl"]
-        shortzy = Shortzy(api_key=SHORTLINK_API, base_site=SHORTLINK_URL)
-        link = await shortzy.convert(link)
-        return link
+    return await shortener.shorten(SHORTLINK_URL, SHORTLINK_API, link)
 
 async def check_token(bot, userid, token):
     user = await bot.get_users(userid)